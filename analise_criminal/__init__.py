@@ -0,0 +1,31 @@
+"""Núcleo analítico do painel de criminalidade do DF, sem dependência de Streamlit."""
+
+from analise_criminal.agregados import AssinaturaFiltro, PacoteAgregados, agregados, assinatura_filtro
+from analise_criminal.atualizacao import BaseIncremental, EstadoBase
+from analise_criminal.carga import carregar_base
+from analise_criminal.categorias import categorizar, classificar
+from analise_criminal.cubo import CuboCriminal, RecorteCubo, construir_cubo
+from analise_criminal.indice import IndiceBitmap
+from analise_criminal.nucleo import agregar, carregar, filtrar
+from analise_criminal.sql import BaseSQL, EstadoSQL
+
+__all__ = [
+    "AssinaturaFiltro",
+    "BaseIncremental",
+    "BaseSQL",
+    "CuboCriminal",
+    "EstadoBase",
+    "EstadoSQL",
+    "IndiceBitmap",
+    "PacoteAgregados",
+    "RecorteCubo",
+    "agregados",
+    "agregar",
+    "assinatura_filtro",
+    "carregar",
+    "carregar_base",
+    "categorizar",
+    "classificar",
+    "construir_cubo",
+    "filtrar",
+]
@@ -0,0 +1,197 @@
+"""Pacote de agregados do painel, memorizado por assinatura de filtro.
+
+Tudo o que o painel mostra abaixo da sidebar (KPIs, ranking, distribuição
+por tipo, série temporal, heatmap, Pareto e estatísticas do detalhamento)
+sai de um único pacote calculado a partir do cubo e guardado num LRU do
+processo. A chave é a versão do cubo mais uma assinatura normalizada da
+seleção, de modo que sessões diferentes com os mesmos filtros compartilham
+o resultado. O que fica abaixo da dobra (heatmap, Pareto e estatísticas)
+só é calculado na primeira vez em que uma seção aberta pede o valor.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from analise_criminal.cache import CacheLRU
+
+
+@dataclass(frozen=True)
+class AssinaturaFiltro:
+    anos: tuple = ()
+    categorias: tuple = ()
+    tipos: tuple = ()
+    regioes: tuple = ()
+
+
+@dataclass(frozen=True)
+class Indicadores:
+    total: int
+    regioes_afetadas: int
+    totais_por_ano: pd.Series
+    variacao: float
+
+    @cached_property
+    def matriz_variacao(self):
+        return matriz_variacao(self.totais_por_ano)
+
+
+@dataclass(frozen=True)
+class PacoteAgregados:
+    recorte: object
+    total: int
+    regioes_afetadas: int
+    totais_por_ano: pd.Series
+    variacao: float
+    por_regiao: pd.Series
+    ranking: pd.DataFrame
+    df_tipo: pd.DataFrame
+    serie_temporal: pd.DataFrame
+
+    @cached_property
+    def pivot(self):
+        return self.recorte.matriz_regiao_ano(top_n=10)
+
+    @cached_property
+    def pareto(self):
+        return self.por_regiao.sort_values(ascending=False).head(15)
+
+    @cached_property
+    def pareto_acum(self):
+        return (self.pareto.cumsum() / self.pareto.sum() * 100).round(1)
+
+    @cached_property
+    def media_regiao(self):
+        return float(self.por_regiao.mean())
+
+    @cached_property
+    def _celulas(self):
+        # Estatísticas por célula região × ano × tipo, a granularidade da base.
+        return pd.Series(self.recorte.quantidade[self.recorte.linhas > 0])
+
+    @cached_property
+    def mediana(self):
+        return float(self._celulas.median())
+
+    @cached_property
+    def desvio(self):
+        return float(self._celulas.std())
+
+
+def _normalizar(valores, universo):
+    # Vazio e "todos marcados" são a mesma seleção: ambos viram ().
+    if not valores:
+        return ()
+    valores = sorted({v.item() if isinstance(v, np.generic) else v for v in valores})
+    if set(valores) >= set(universo):
+        return ()
+    return tuple(valores)
+
+
+def assinatura_filtro(cubo, anos=None, categorias=None, tipos=None, regioes=None):
+    """Assinatura canônica (ordenada e sem redundâncias) de uma seleção."""
+    categorias = _normalizar(categorias, cubo.categorias)
+    tipos_possiveis = cubo.tipos_das_categorias(categorias) if categorias else cubo.tipos
+    return AssinaturaFiltro(
+        anos=_normalizar(anos, cubo.anos),
+        categorias=categorias,
+        tipos=_normalizar(tipos, tipos_possiveis),
+        regioes=_normalizar(regioes, cubo.regioes),
+    )
+
+
+def matriz_variacao(totais_por_ano):
+    """Variação percentual entre cada par de anos: linha = ano base, coluna = ano comparado."""
+    valores = totais_por_ano.to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matriz = (valores[None, :] - valores[:, None]) / valores[:, None] * 100
+    matriz[~np.isfinite(matriz)] = np.nan
+    return pd.DataFrame(
+        matriz,
+        index=pd.Index(totais_por_ano.index, name="Ano base"),
+        columns=pd.Index(totais_por_ano.index, name="Ano comparado"),
+    )
+
+
+def indicadores(cubo, assinatura):
+    """KPIs da seleção, lidos dos rollups do cubo (sem recortar o cubo inteiro)."""
+    total, regioes_afetadas, totais_por_ano = cubo.resumo(
+        anos=assinatura.anos,
+        categorias=assinatura.categorias,
+        tipos=assinatura.tipos,
+        regioes=assinatura.regioes,
+    )
+
+    anos = assinatura.anos or tuple(cubo.anos)
+    variacao = 0
+    if len(anos) >= 2 and len(totais_por_ano) >= 2:
+        ultimo = totais_por_ano.get(anos[-1], 0)
+        penultimo = totais_por_ano.get(anos[-2], 0)
+        variacao = ((ultimo - penultimo) / penultimo * 100) if penultimo else 0
+
+    return Indicadores(
+        total=total,
+        regioes_afetadas=regioes_afetadas,
+        totais_por_ano=totais_por_ano,
+        variacao=float(variacao),
+    )
+
+
+def calcular_agregados(cubo, assinatura):
+    recorte = cubo.recortar(
+        anos=assinatura.anos,
+        categorias=assinatura.categorias,
+        tipos=assinatura.tipos,
+        regioes=assinatura.regioes,
+    )
+    kpis = indicadores(cubo, assinatura)
+    por_regiao = recorte.por_regiao()
+
+    return PacoteAgregados(
+        recorte=recorte,
+        total=kpis.total,
+        regioes_afetadas=kpis.regioes_afetadas,
+        totais_por_ano=kpis.totais_por_ano,
+        variacao=kpis.variacao,
+        por_regiao=por_regiao,
+        ranking=por_regiao.reset_index().sort_values("Quantidade", ascending=True).tail(15),
+        df_tipo=recorte.por_tipo().reset_index(),
+        serie_temporal=recorte.por_ano_tipo(),
+    )
+
+
+CACHE_AGREGADOS = CacheLRU(
+    max_entradas=int(os.environ.get("PAINEL_CACHE_ENTRADAS", 256)),
+    max_bytes=int(os.environ.get("PAINEL_CACHE_MB", 64)) * 1024 * 1024,
+)
+
+
+def agregados(cubo, assinatura):
+    """Pacote de agregados da seleção, servido do LRU compartilhado quando possível."""
+    return CACHE_AGREGADOS.obter(
+        (cubo.versao, assinatura),
+        lambda: calcular_agregados(cubo, assinatura),
+    )
+
+
+def preservar_entradas(cache, versao_antiga, versao_nova, anos_afetados):
+    """Leva para ``versao_nova`` as entradas de ``cache`` que continuam válidas.
+
+    Uma entrada sobrevive se a sua seleção de anos não toca nenhum ano
+    alterado; as demais (e as de versões mais antigas) são descartadas. As
+    chaves são tuplas com a versão do cubo e uma ``AssinaturaFiltro``.
+    """
+    anos_afetados = set(anos_afetados)
+
+    def transformar(chave):
+        if versao_antiga not in chave:
+            return None
+        assinatura = next(c for c in chave if isinstance(c, AssinaturaFiltro))
+        if not assinatura.anos or not anos_afetados.isdisjoint(assinatura.anos):
+            return None
+        return tuple(versao_nova if c == versao_antiga else c for c in chave)
+
+    cache.remapear(transformar)
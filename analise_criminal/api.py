@@ -0,0 +1,239 @@
+"""API HTTP local com os agregados do painel em JSON.
+
+Expõe os mesmos números do painel para outras ferramentas, sem Streamlit e
+sem dependências além da biblioteca padrão::
+
+    python -m analise_criminal.api --porta 8502
+    curl 'http://localhost:8502/ranking?anos=2023,2024&categorias=Roubos'
+
+Os filtros são os da sidebar (``anos``, ``categorias``, ``tipos``,
+``regioes``), repetidos ou separados por vírgula; ausentes significam
+"todos". Cada resposta leva um ``ETag`` derivado da versão da base, da
+assinatura do filtro e do endpoint: um ``If-None-Match`` igual devolve
+``304`` sem recalcular nada. Os corpos ficam num LRU do processo, e a
+atualização incremental da base só invalida as respostas dos anos
+alterados (``/versao``, que descreve a base inteira, sempre é refeita).
+
+O backend é o mesmo do painel (``PAINEL_BACKEND``).
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from analise_criminal.agregados import CACHE_AGREGADOS, agregados, assinatura_filtro, indicadores, preservar_entradas
+from analise_criminal.aquecimento import iniciar_aquecimento
+from analise_criminal.cache import CacheLRU
+from analise_criminal.carga import CAMINHO_BASE
+from analise_criminal.sql import BACKEND, abrir_base
+
+logger = logging.getLogger(__name__)
+
+CACHE_RESPOSTAS = CacheLRU(
+    max_entradas=int(os.environ.get("PAINEL_CACHE_RESPOSTAS", 1024)),
+    max_bytes=int(os.environ.get("PAINEL_CACHE_RESPOSTAS_MB", 32)) * 1024 * 1024,
+    medir=len,
+)
+
+
+def _numero(valor):
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def _registros(df):
+    return [{col: _numero(v) for col, v in zip(df.columns, linha)} for linha in df.itertuples(index=False)]
+
+
+def _versao(cubo, assinatura):
+    return {
+        "versao": cubo.versao,
+        "anos": [_numero(a) for a in cubo.anos],
+        "categorias": list(cubo.categorias),
+        "tipos": list(cubo.tipos),
+        "regioes": list(cubo.regioes),
+    }
+
+
+def _kpis(cubo, assinatura):
+    kpis = indicadores(cubo, assinatura)
+    matriz = kpis.matriz_variacao
+    return {
+        "total": kpis.total,
+        "regioes_afetadas": kpis.regioes_afetadas,
+        "variacao": kpis.variacao,
+        "totais_por_ano": {str(_numero(a)): _numero(q) for a, q in kpis.totais_por_ano.items()},
+        "matriz_variacao": {
+            "anos": [_numero(a) for a in matriz.index],
+            "valores": [[_numero(round(v, 2)) for v in linha] for linha in matriz.to_numpy()],
+        },
+    }
+
+
+def _ranking(cubo, assinatura):
+    ranking = agregados(cubo, assinatura).ranking.iloc[::-1]
+    return _registros(ranking)
+
+
+def _tipos(cubo, assinatura):
+    pacote = agregados(cubo, assinatura)
+    df_tipo = pacote.df_tipo.assign(Percentual=lambda d: (d["Quantidade"] / pacote.total * 100).round(2) if pacote.total else 0.0)
+    return _registros(df_tipo)
+
+
+def _temporal(cubo, assinatura):
+    return _registros(agregados(cubo, assinatura).serie_temporal)
+
+
+def _heatmap(cubo, assinatura):
+    pivot = agregados(cubo, assinatura).pivot
+    return {
+        "regioes": list(pivot.index),
+        "anos": [_numero(a) for a in pivot.columns],
+        "valores": [[_numero(v) for v in linha] for linha in pivot.to_numpy()],
+    }
+
+
+def _pareto(cubo, assinatura):
+    pacote = agregados(cubo, assinatura)
+    return [
+        {"Regiao": regiao, "Quantidade": _numero(qtd), "Percentual_Acumulado": _numero(acum)}
+        for regiao, qtd, acum in zip(pacote.pareto.index, pacote.pareto.to_numpy(), pacote.pareto_acum.to_numpy())
+    ]
+
+
+ENDPOINTS = {
+    "versao": _versao,
+    "kpis": _kpis,
+    "ranking": _ranking,
+    "tipos": _tipos,
+    "temporal": _temporal,
+    "heatmap": _heatmap,
+    "pareto": _pareto,
+}
+# Respostas sobre a base inteira, e não sobre a seleção: não sobrevivem a
+# nenhuma atualização, mesmo que os anos filtrados não tenham mudado.
+ENDPOINTS_DA_BASE = frozenset({"versao"})
+
+
+def ler_filtros(consulta):
+    """``{"anos": [...], ...}`` a partir da query string, aceitando repetição e vírgulas."""
+    parametros = parse_qs(consulta, keep_blank_values=False)
+    filtros = {}
+    for nome in ("anos", "categorias", "tipos", "regioes"):
+        valores = [v.strip() for bruto in parametros.get(nome, []) for v in bruto.split(",") if v.strip()]
+        if nome == "anos":
+            try:
+                valores = [int(v) for v in valores]
+            except ValueError:
+                raise ValueError(f"Parâmetro 'anos' inválido: {parametros['anos']}") from None
+        filtros[nome] = valores or None
+    return filtros
+
+
+def etag(versao, assinatura, endpoint):
+    h = hashlib.sha1(repr((versao, assinatura, endpoint)).encode())
+    return f'"{h.hexdigest()[:20]}"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "PainelCriminalDF"
+
+    def log_message(self, formato, *args):
+        logger.info("%s %s", self.address_string(), formato % args)
+
+    def _responder(self, status, corpo=b"", cabecalhos=None):
+        self.send_response(status)
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(corpo)
+
+    def _erro(self, status, mensagem):
+        self._responder(status, json.dumps({"erro": mensagem}, ensure_ascii=False).encode())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip("/") or "versao"
+        if endpoint not in ENDPOINTS:
+            return self._erro(404, f"Endpoint desconhecido: '{endpoint}'. Disponíveis: {sorted(ENDPOINTS)}")
+        try:
+            filtros = ler_filtros(url.query)
+        except ValueError as e:
+            return self._erro(400, str(e))
+
+        try:
+            cubo = self.server.estado_atual().cubo
+        except (OSError, ValueError) as e:
+            logger.exception("Base indisponível")
+            return self._erro(503, f"Base indisponível: {e}")
+
+        assinatura = assinatura_filtro(cubo, **filtros)
+        marca = etag(cubo.versao, assinatura, endpoint)
+        cabecalhos = {"ETag": marca, "Cache-Control": "no-cache", "X-Versao-Base": cubo.versao}
+        if marca in [m.strip() for m in self.headers.get("If-None-Match", "").split(",")]:
+            return self._responder(304, cabecalhos=cabecalhos)
+
+        corpo = CACHE_RESPOSTAS.obter(
+            (endpoint, cubo.versao, assinatura),
+            lambda: json.dumps(ENDPOINTS[endpoint](cubo, assinatura), ensure_ascii=False).encode(),
+        )
+        self._responder(200, corpo, cabecalhos)
+
+
+class ServidorAgregados(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, base):
+        super().__init__(endereco, _Handler)
+        self.base = base
+
+    def estado_atual(self):
+        atualizacao = self.base.atualizar()
+        if atualizacao is not None:
+            CACHE_RESPOSTAS.descartar(lambda chave: chave[0] in ENDPOINTS_DA_BASE)
+            # Só as respostas que tocam os anos alterados perdem o cache.
+            for cache in (CACHE_AGREGADOS, CACHE_RESPOSTAS):
+                preservar_entradas(cache, atualizacao.versao_antiga, atualizacao.versao_nova, atualizacao.anos_afetados)
+        return self.base.estado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    parser.add_argument("--fontes", nargs="+", default=[CAMINHO_BASE, os.environ.get("PAINEL_DIRETORIO_DADOS", "dados")],
+                        help="CSVs e diretórios da base (padrão: os mesmos do painel)")
+    parser.add_argument("--backend", choices=["pandas", "sql"], default=BACKEND,
+                        help="backend da base (padrão: PAINEL_BACKEND, como no painel)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    servidor = ServidorAgregados((args.host, args.porta), abrir_base(args.fontes, args.backend))
+    logger.info("API de agregados em http://%s:%d/", args.host, args.porta)
+    # Só agregados: a API não serve figuras.
+    iniciar_aquecimento(servidor.estado_atual, graficos=())
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Aquecimento dos caches de agregados e figuras na partida do processo.
+
+Uma thread em segundo plano carrega a base e calcula KPIs, agregados e as
+figuras das seleções mais prováveis, enquanto o servidor já atende:
+
+* a visão padrão do painel (último ano, sem outros filtros), sempre primeiro;
+* as seleções fixas de ``PAINEL_AQUECER`` (lista JSON de objetos com
+  ``anos``, ``categorias``, ``tipos`` e ``regioes``);
+* as seleções mais frequentes no log de seleções, onde o painel registra a
+  assinatura de cada rerun com ``registrar_selecao``, com ou sem o perfil
+  ligado.
+
+O log de seleções (``PAINEL_LOG_SELECOES``, padrão
+``.cache_painel/selecoes.jsonl``; vazio desliga) é limitado: passando de
+``PAINEL_AQUECER_LOG_MB`` ele é reescrito só com a metade mais recente.
+
+Desligado com ``PAINEL_AQUECIMENTO=0``.
+
+A thread só começa com a primeira sessão do processo. Para que essa sessão
+já encontre a base pronta, rode antes de subir o servidor::
+
+    python -m analise_criminal.aquecimento && streamlit run crimes_df01.py
+
+Isso monta a base do backend configurado: o sidecar Parquet e a publicação
+mapeada em memória (ou o banco, com ``PAINEL_BACKEND=sql``). O processo do
+painel então só anexa a ela, sem reler os CSVs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from analise_criminal.agregados import agregados, assinatura_filtro, indicadores
+from analise_criminal.carga import CAMINHO_BASE, DIRETORIO_SIDECAR
+from analise_criminal.figuras import FIGURAS, TEMA_PADRAO, spec_figura
+
+logger = logging.getLogger(__name__)
+
+ATIVO_PADRAO = os.environ.get("PAINEL_AQUECIMENTO", "1").lower() not in ("0", "false", "nao", "não")
+MAX_SELECOES = int(os.environ.get("PAINEL_AQUECER_MAX", 20))
+ARQUIVO_SELECOES = os.environ.get("PAINEL_LOG_SELECOES", os.path.join(DIRETORIO_SIDECAR, "selecoes.jsonl"))
+# Teto do log de seleções: as populares agora, não as de meses atrás.
+BYTES_LOG = int(os.environ.get("PAINEL_AQUECER_LOG_MB", 8)) * 1024 * 1024
+CAMPOS = ("anos", "categorias", "tipos", "regioes")
+
+_trava_log = threading.Lock()
+
+
+def _selecao(bruta):
+    if not isinstance(bruta, dict) or set(bruta) - set(CAMPOS):
+        raise ValueError(f"Seleção inválida: {bruta!r}")
+    return {campo: list(bruta.get(campo) or []) for campo in CAMPOS}
+
+
+def selecoes_configuradas(valor=None):
+    """Seleções fixas de ``PAINEL_AQUECER``; uma lista inválida é ignorada com aviso."""
+    valor = os.environ.get("PAINEL_AQUECER", "") if valor is None else valor
+    if not valor.strip():
+        return []
+    try:
+        return [_selecao(s) for s in json.loads(valor)]
+    except (TypeError, ValueError) as e:
+        logger.warning("PAINEL_AQUECER ignorado: %s", e)
+        return []
+
+
+def _ler_fim(caminho, max_bytes):
+    with open(caminho, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        inicio = max(0, f.tell() - max_bytes)
+        f.seek(inicio)
+        if inicio:
+            f.readline()  # linha cortada pelo seek
+        return f.read()
+
+
+def registrar_selecao(assinatura, caminho=ARQUIVO_SELECOES, max_bytes=BYTES_LOG):
+    """Acrescenta ``assinatura`` (dict com ``CAMPOS``) ao log de seleções.
+
+    Falhas de escrita só vão para o log de depuração: o rerun não depende
+    disso.
+    """
+    if not caminho:
+        return
+    linha = json.dumps({"assinatura": assinatura}, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _trava_log:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            with open(caminho, "a", encoding="utf-8") as f:
+                f.write(linha)
+                tamanho = f.tell()
+            if tamanho > max_bytes:
+                temporario = f"{caminho}.{os.getpid()}.tmp"
+                with open(temporario, "wb") as f:
+                    f.write(_ler_fim(caminho, max_bytes // 2))
+                os.replace(temporario, caminho)
+    except OSError as e:
+        logger.debug("Seleção não registrada em %s: %s", caminho, e)
+
+
+def selecoes_populares(caminho=ARQUIVO_SELECOES, limite=MAX_SELECOES, max_bytes=BYTES_LOG):
+    """Seleções mais frequentes no log de seleções, da mais para a menos usada."""
+    if not caminho or not os.path.exists(caminho):
+        return []
+    linhas = _ler_fim(caminho, max_bytes).decode("utf-8", errors="replace").splitlines()
+
+    contagem = Counter()
+    for linha in linhas:
+        try:
+            selecao = _selecao(json.loads(linha)["assinatura"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        contagem[json.dumps(selecao, sort_keys=True, ensure_ascii=False)] += 1
+    return [json.loads(s) for s, _ in contagem.most_common(limite)]
+
+
+def selecao_padrao(cubo):
+    return {"anos": [cubo.anos.max().item()] if len(cubo.anos) else []}
+
+
+def selecoes_para_aquecer(cubo, limite=MAX_SELECOES):
+    """Até ``limite`` seleções distintas (pela assinatura), a visão padrão primeiro."""
+    unicas = {}
+    for selecao in [selecao_padrao(cubo)] + selecoes_configuradas() + selecoes_populares():
+        if len(unicas) >= max(1, limite):
+            break
+        try:
+            unicas.setdefault(assinatura_filtro(cubo, **selecao), selecao)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Seleção %s ignorada: %s", selecao, e)
+    return list(unicas.values())
+
+
+def aquecer(cubo, selecoes, graficos=tuple(FIGURAS), tema=TEMA_PADRAO):
+    """Calcula KPIs, agregados e figuras de cada seleção; devolve quantas foram aquecidas.
+
+    Uma seleção que falha (por exemplo, uma região que saiu da base) não
+    impede as outras.
+    """
+    feitas = 0
+    for selecao in selecoes:
+        try:
+            assinatura = assinatura_filtro(cubo, **selecao)
+            indicadores(cubo, assinatura)
+            pacote = agregados(cubo, assinatura)
+            for grafico in graficos:
+                spec_figura(grafico, cubo, assinatura, pacote, tema)
+        except Exception as e:  # noqa: BLE001 - aquecimento nunca derruba o servidor
+            logger.warning("Seleção %s não aquecida: %s", selecao, e)
+            continue
+        feitas += 1
+    return feitas
+
+
+class Aquecedor(threading.Thread):
+    """Thread que obtém o estado com ``obter_estado()`` e aquece as seleções."""
+
+    def __init__(self, obter_estado, graficos=tuple(FIGURAS), limite=MAX_SELECOES):
+        super().__init__(name="aquecimento-painel", daemon=True)
+        self.obter_estado = obter_estado
+        self.graficos = graficos
+        self.limite = limite
+        self.selecoes = 0
+        self.aquecidas = 0
+        self.segundos = None
+        self.concluido = threading.Event()
+
+    def run(self):
+        inicio = time.perf_counter()
+        try:
+            cubo = self.obter_estado().cubo
+            selecoes = selecoes_para_aquecer(cubo, self.limite)
+            self.selecoes = len(selecoes)
+            self.aquecidas = aquecer(cubo, selecoes, self.graficos)
+        except Exception:  # noqa: BLE001
+            logger.exception("Aquecimento interrompido")
+        finally:
+            self.segundos = time.perf_counter() - inicio
+            self.concluido.set()
+        logger.info("Aquecimento: %d seleções em %.2fs", self.aquecidas, self.segundos)
+
+
+def iniciar_aquecimento(obter_estado, graficos=tuple(FIGURAS), ativo=ATIVO_PADRAO):
+    """Dispara o ``Aquecedor`` em segundo plano; ``None`` se desligado."""
+    if not ativo:
+        return None
+    aquecedor = Aquecedor(obter_estado, graficos)
+    aquecedor.start()
+    return aquecedor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepara a base do painel antes de subir o servidor.")
+    parser.add_argument("--fontes", nargs="+", default=[CAMINHO_BASE, os.environ.get("PAINEL_DIRETORIO_DADOS", "dados")],
+                        help="CSVs e diretórios da base (padrão: os mesmos do painel)")
+    args = parser.parse_args(argv)
+
+    from analise_criminal.sql import abrir_base
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    inicio = time.perf_counter()
+    base = abrir_base(args.fontes)
+    cubo = base.estado.cubo
+    logger.info(
+        "Base pronta em %.2fs: versão %s, %d regiões × %d anos × %d tipos",
+        time.perf_counter() - inicio, cubo.versao, len(cubo.regioes), len(cubo.anos), len(cubo.tipos),
+    )
+    # Sem compartilhamento, a base montada aqui morre com o processo.
+    if not getattr(base, "compartilhar", True):
+        logger.warning("PAINEL_COMPARTILHAR=0: só o sidecar Parquet fica pronto para o painel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Atualização incremental da base a partir dos arquivos de origem.
+
+Em vez de descartar tudo a cada expiração de TTL, a base é mantida como um
+conjunto de partições (o CSV principal e, opcionalmente, um diretório com
+arquivos por ano). Cada verificação só faz ``stat`` nos arquivos; apenas
+partições novas, alteradas ou removidas são relidas, e os anos que elas
+tocam são informados para que só as visões afetadas percam o cache.
+
+Diretórios particionados por ano (``ano=2024/*.csv``) permitem recortar a
+base: com ``anos`` (ou ``PAINEL_ANOS=2023,2024``) as partições de outros
+anos nem são abertas. As partições a ler são lidas em paralelo, em threads
+(o parser do pandas e o Parquet liberam a GIL), e cada resultado entra
+direto na concatenação final.
+
+Cada estado montado é publicado em arquivos mapeados em memória (ver
+``compartilhado``), e outros processos do host anexam a ele sem reler.
+"""
+
+import glob
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+from analise_criminal import compartilhado
+from analise_criminal.carga import agregar_celulas, ano_da_particao, anos_diferentes, carregar_base
+from analise_criminal.categorias import categorizar
+from analise_criminal.cubo import construir_cubo
+from analise_criminal.indice import IndiceBitmap
+from analise_criminal.tabela import TAMANHO_PAGINA, paginar
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_VERIFICACAO = float(os.environ.get("PAINEL_INTERVALO_ATUALIZACAO", 60))
+LEITORES = int(os.environ.get("PAINEL_LEITORES", 0)) or os.cpu_count() or 1
+
+
+def _anos_do_ambiente(valor):
+    if not valor:
+        return None
+    try:
+        return frozenset(int(a) for a in valor.split(",") if a.strip())
+    except ValueError:
+        raise ValueError(f"PAINEL_ANOS inválido: '{valor}'") from None
+
+
+ANOS_PADRAO = _anos_do_ambiente(os.environ.get("PAINEL_ANOS"))
+
+
+@dataclass(frozen=True)
+class Particao:
+    mtime_ns: int
+    tamanho: int
+    df: pd.DataFrame
+    celulas: pd.DataFrame
+
+    @property
+    def anos(self):
+        return set(self.celulas["Ano"].unique().tolist())
+
+
+@dataclass(frozen=True)
+class EstadoBase:
+    df: pd.DataFrame
+    cubo: object
+    indice: IndiceBitmap
+
+    @property
+    def colunas(self):
+        return list(self.df.columns)
+
+    def para_sessao(self):
+        """Estado com cópia rasa do frame: escritas da sessão não chegam ao compartilhado."""
+        return replace(self, df=self.df.copy(deep=False))
+
+    def contar(self, selecoes):
+        return self.indice.contar(selecoes)
+
+    def pagina(self, selecoes, coluna="Quantidade", descendente=True, pagina=0, tamanho=TAMANHO_PAGINA, colunas=None):
+        return paginar(self.df, self.indice.linhas(selecoes), coluna, descendente, pagina, tamanho, colunas)
+
+
+@dataclass(frozen=True)
+class Atualizacao:
+    versao_antiga: str
+    versao_nova: str
+    anos_afetados: frozenset
+
+
+def _juntar(frames):
+    df = pd.concat(frames, ignore_index=True)
+    # Concatenar categóricas com categorias diferentes devolve texto.
+    for col in ("Regiao", "Tipo_Crime"):
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    if "Linhas" in df.columns:
+        df["Linhas"] = df["Linhas"].fillna(1).astype("int64")
+    return df
+
+
+def _mesmas_linhas(antigo, novo):
+    """``novo`` tem as mesmas linhas de ``antigo`` (que pode ter colunas a mais, como ``Categoria``)?"""
+    if len(antigo) != len(novo) or not set(novo.columns) <= set(antigo.columns):
+        return False
+    return all(
+        antigo[col].reset_index(drop=True).astype(novo[col].dtype).equals(novo[col].reset_index(drop=True))
+        for col in novo.columns
+    )
+
+
+def montar_estado(frames, celulas=None):
+    """Junta partições já lidas em ``EstadoBase`` (frame, cubo e índice bitmap)."""
+    df = _juntar(frames)
+    df["Categoria"] = categorizar(df["Tipo_Crime"])
+    # O cubo sai das células agregadas de cada partição, não das linhas.
+    celulas = agregar_celulas(_juntar(celulas if celulas is not None else [agregar_celulas(f) for f in frames]))
+    celulas["Categoria"] = categorizar(celulas["Tipo_Crime"])
+    return EstadoBase(df=df, cubo=construir_cubo(celulas), indice=IndiceBitmap(df))
+
+
+class BaseIncremental:
+    """Base em memória composta por partições relidas só quando mudam.
+
+    ``fontes`` aceita arquivos CSV e diretórios (todos os ``*.csv`` dentro
+    deles são partições). Fontes inexistentes são ignoradas, exceto quando
+    nenhuma partição é encontrada. Com ``anos``, só esses anos entram na
+    base: partições ``ano=AAAA`` de outros anos são puladas e arquivos sem
+    partição por ano são filtrados por linha.
+    """
+
+    def __init__(self, fontes, intervalo=INTERVALO_VERIFICACAO, compartilhar=compartilhado.ATIVO_PADRAO,
+                 anos=ANOS_PADRAO, leitores=LEITORES):
+        self.fontes = list(fontes)
+        self.intervalo = intervalo
+        self.compartilhar = compartilhar
+        self.anos = frozenset(anos) if anos is not None else None
+        self.leitores = max(1, leitores)
+        self.diretorio_compartilhado = compartilhado.diretorio_padrao(self.fontes[0])
+        if self.anos is not None:
+            # Um recorte tem publicação própria, fora da pasta da base inteira
+            # (cuja limpeza apagaria as outras publicações).
+            self.diretorio_compartilhado += "-anos-" + "-".join(map(str, sorted(self.anos)))
+        self._particoes = {}
+        self._trava = threading.Lock()
+        self._ultima_verificacao = 0.0
+        self.estado = None
+        self.atualizar(forcar=True)
+
+    def arquivos(self):
+        encontrados = []
+        for fonte in self.fontes:
+            if os.path.isdir(fonte):
+                encontrados.extend(sorted(glob.glob(os.path.join(fonte, "**", "*.csv"), recursive=True)))
+            elif os.path.exists(fonte):
+                encontrados.append(fonte)
+        if self.anos is not None:
+            encontrados = [c for c in encontrados if ano_da_particao(c) in self.anos or ano_da_particao(c) is None]
+        return encontrados
+
+    def _ler_particao(self, caminho, stat):
+        df = carregar_base(caminho)
+        if self.anos is not None and not df["Ano"].isin(self.anos).all():
+            df = df[df["Ano"].isin(self.anos)].reset_index(drop=True)
+        return Particao(stat.st_mtime_ns, stat.st_size, df, agregar_celulas(df))
+
+    def _ler_pendentes(self, pendentes):
+        """``{caminho: Future}`` com a leitura de cada partição pendente, em até ``leitores`` threads."""
+        with ThreadPoolExecutor(max(1, min(self.leitores, len(pendentes))), thread_name_prefix="leitor-base") as executor:
+            return {caminho: executor.submit(self._ler_particao, caminho, stat) for caminho, stat in pendentes.items()}
+
+    def atualizar(self, forcar=False):
+        """Relê o que mudou desde a última verificação.
+
+        Devolve uma ``Atualizacao`` quando o conteúdo mudou, ou ``None``.
+        Fora do intervalo de verificação a chamada não toca o disco.
+        """
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_verificacao < self.intervalo:
+            return None
+
+        with self._trava:
+            if not forcar and agora - self._ultima_verificacao < self.intervalo:
+                return None
+            self._ultima_verificacao = agora
+
+            arquivos = self.arquivos()
+            if not arquivos:
+                raise FileNotFoundError(f"Nenhum arquivo de dados em {self.fontes}")
+
+            if self.estado is None and self.compartilhar and self._anexar(arquivos):
+                logger.info("Base anexada de %s", self.diretorio_compartilhado)
+                return Atualizacao(None, self.estado.cubo.versao, frozenset(self.estado.cubo.anos.tolist()))
+
+            particoes = {}
+            anos_afetados = set()
+            mudou = False
+            pendentes = {}
+            for caminho in arquivos:
+                stat = os.stat(caminho)
+                atual = self._particoes.get(caminho)
+                if atual is not None and (atual.mtime_ns, atual.tamanho) == (stat.st_mtime_ns, stat.st_size):
+                    particoes[caminho] = atual
+                else:
+                    pendentes[caminho] = stat
+
+            for caminho, futuro in self._ler_pendentes(pendentes).items():
+                atual = self._particoes.get(caminho)
+                try:
+                    nova = futuro.result()
+                except (OSError, ValueError) as e:
+                    if atual is None and self.estado is None:
+                        raise
+                    # Arquivo em escrita ou inválido: mantém a versão anterior.
+                    logger.warning("Partição %s não atualizada: %s", caminho, e)
+                    if atual is not None:
+                        particoes[caminho] = atual
+                    continue
+                if atual is not None and _mesmas_linhas(atual.df, nova.df):
+                    # Só o mtime mudou: fica a fatia que já está no frame montado.
+                    particoes[caminho] = replace(atual, mtime_ns=nova.mtime_ns, tamanho=nova.tamanho)
+                    continue
+                mudou = True
+                if atual is None:
+                    anos_afetados |= nova.anos
+                else:
+                    # Célula a célula: acrescentar só o ano mais novo ao CSV
+                    # não invalida as visões dos outros anos.
+                    anos_afetados |= anos_diferentes(atual.celulas, nova.celulas)
+                particoes[caminho] = nova
+
+            for caminho in self._particoes.keys() - particoes.keys():
+                mudou = True
+                anos_afetados |= self._particoes[caminho].anos
+
+            # Mesma ordem dos arquivos, seja qual for a ordem de leitura.
+            self._particoes = {c: particoes[c] for c in arquivos if c in particoes}
+            if self.estado is not None and not mudou:
+                return None
+
+            versao_antiga = self.estado.cubo.versao if self.estado is not None else None
+            self.estado = self._montar_estado()
+            logger.info("Base atualizada; anos afetados: %s", sorted(anos_afetados))
+            return Atualizacao(versao_antiga, self.estado.cubo.versao, frozenset(anos_afetados))
+
+    def _montar_estado(self):
+        partes = list(self._particoes.values())
+        estado = montar_estado([p.df for p in partes], [p.celulas for p in partes])
+        arquivos = self._faixas()
+        if self.compartilhar:
+            try:
+                destino = compartilhado.publicar(estado, arquivos, self.diretorio_compartilhado)
+                estado, arquivos = compartilhado.anexar(destino)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning("Base não publicada para outros processos: %s", e)
+        # As partições passam a ser fatias do frame montado (ou mapeado): o
+        # processo não guarda uma segunda cópia das linhas.
+        self._particoes = self._particoes_anexadas(estado, arquivos, self._particoes)
+        return estado
+
+    def _faixas(self):
+        """``[caminho, mtime_ns, tamanho, inicio, fim]`` de cada partição no frame montado."""
+        arquivos, inicio = [], 0
+        for caminho, p in self._particoes.items():
+            arquivos.append([caminho, p.mtime_ns, p.tamanho, inicio, inicio + len(p.df)])
+            inicio += len(p.df)
+        return arquivos
+
+    @staticmethod
+    def _particoes_anexadas(estado, arquivos, anteriores=None):
+        particoes = {}
+        for caminho, mtime_ns, tamanho, inicio, fim in arquivos:
+            fatia = estado.df.iloc[inicio:fim]
+            anterior = (anteriores or {}).get(caminho)
+            celulas = anterior.celulas if anterior is not None else agregar_celulas(fatia)
+            particoes[caminho] = Particao(mtime_ns, tamanho, fatia, celulas)
+        return particoes
+
+    def _anexar(self, arquivos):
+        """Anexa à publicação atual se ela corresponde aos arquivos em disco."""
+        try:
+            anexado = compartilhado.anexar_atual(self.diretorio_compartilhado)
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            logger.warning("Publicação compartilhada ignorada: %s", e)
+            return False
+        if anexado is None:
+            return False
+        estado, publicados = anexado
+        em_disco = []
+        for caminho in arquivos:
+            stat = os.stat(caminho)
+            em_disco.append([caminho, stat.st_mtime_ns, stat.st_size])
+        if [a[:3] for a in publicados] != em_disco:
+            return False
+        self._particoes = self._particoes_anexadas(estado, publicados)
+        self.estado = estado
+        return True
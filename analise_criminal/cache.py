@@ -0,0 +1,103 @@
+"""Cache LRU em memória, compartilhado por todas as sessões do processo.
+
+Limitado ao mesmo tempo por número de entradas e por bytes estimados.
+"""
+
+import dataclasses
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def tamanho_bytes(valor):
+    """Estimativa do espaço ocupado por ``valor`` (frames, arrays e contêineres)."""
+    if isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum()) if isinstance(uso, pd.Series) else int(uso)
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        return sum(tamanho_bytes(getattr(valor, c.name)) for c in dataclasses.fields(valor))
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(k) + tamanho_bytes(v) for k, v in valor.items())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    def __init__(self, max_entradas=256, max_bytes=64 * 1024 * 1024, medir=tamanho_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._medir = medir
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def buscar(self, chave, padrao=None):
+        with self._trava:
+            if chave not in self._itens:
+                self.faltas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return self._itens[chave][0]
+
+    def guardar(self, chave, valor):
+        tamanho = self._medir(valor)
+        with self._trava:
+            if chave in self._itens:
+                self._bytes -= self._itens.pop(chave)[1]
+            if tamanho > self.max_bytes:
+                return valor
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            while len(self._itens) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, removido) = self._itens.popitem(last=False)
+                self._bytes -= removido
+        return valor
+
+    def obter(self, chave, calcular):
+        """Devolve o valor em cache ou calcula, guarda e devolve."""
+        ausente = object()
+        valor = self.buscar(chave, ausente)
+        if valor is ausente:
+            valor = self.guardar(chave, calcular())
+        return valor
+
+    def remapear(self, transformar):
+        """Troca a chave de cada entrada por ``transformar(chave)``; ``None`` remove."""
+        with self._trava:
+            itens, self._itens = self._itens, OrderedDict()
+            self._bytes = 0
+            for chave, (valor, tamanho) in itens.items():
+                nova = transformar(chave)
+                if nova is not None:
+                    self._itens[nova] = (valor, tamanho)
+                    self._bytes += tamanho
+
+    def descartar(self, condicao):
+        """Remove as entradas cuja chave satisfaz ``condicao``."""
+        with self._trava:
+            for chave in [c for c in self._itens if condicao(c)]:
+                self._bytes -= self._itens.pop(chave)[1]
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self._bytes = 0
@@ -0,0 +1,243 @@
+"""Leitura compacta da base de criminalidade.
+
+As colunas de texto são carregadas como ``category``, ``Ano`` como int16 e
+``Quantidade`` como int32 (int64 quando algum valor não cabe). O resultado tipado é gravado num sidecar Parquet
+ao lado do CSV, identificado pelo mtime/tamanho e pelo hash do arquivo de
+origem, para que partidas a frio (e expirações de cache) não precisem
+reprocessar o CSV.
+
+Extrações grandes (mensais, diárias ou por ocorrência) são lidas em blocos
+e somadas direto nos totais região × ano × tipo, sem nunca manter a tabela
+bruta inteira em memória; a coluna ``Linhas`` guarda quantos registros de
+origem caíram em cada célula. Os totais por célula ficam sempre em int64.
+
+Arquivos em diretórios particionados por ano (``dados/ano=2024/*.csv``)
+podem omitir a coluna ``Ano``: ela vem do nome do diretório.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_BASE = "base_criminalidade_tratada.csv"
+COLUNAS_NECESSARIAS = ["Tipo_Crime", "Ano", "Quantidade", "Regiao"]
+DIRETORIO_SIDECAR = ".cache_painel"
+
+CHAVES_CELULA = ["Regiao", "Ano", "Tipo_Crime"]
+TIPOS_TEXTO = {"Regiao": "category", "Tipo_Crime": "category"}
+
+TAMANHO_BLOCO = int(os.environ.get("PAINEL_TAMANHO_BLOCO", 500_000))
+# Acima deste tamanho o modo "auto" passa a ler em blocos.
+LIMITE_LEITURA_COMPLETA = int(os.environ.get("PAINEL_LIMITE_LEITURA_MB", 256)) * 1024 * 1024
+
+_DIRETORIO_ANO = re.compile(r"ano=(\d{4})", re.IGNORECASE)
+
+
+def _hash_arquivo(caminho, bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for parte in iter(lambda: f.read(bloco), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def _caminhos_sidecar(caminho, sufixo=""):
+    pasta = os.path.join(os.path.dirname(os.path.abspath(caminho)), DIRETORIO_SIDECAR)
+    nome = os.path.splitext(os.path.basename(caminho))[0] + sufixo
+    return pasta, os.path.join(pasta, nome + ".parquet"), os.path.join(pasta, nome + ".json")
+
+
+def validar_colunas(colunas):
+    for col in COLUNAS_NECESSARIAS:
+        if col not in colunas:
+            raise ValueError(f"Coluna '{col}' não encontrada no dataset")
+
+
+def ano_da_particao(caminho):
+    """Ano do diretório ``ano=AAAA`` mais próximo do arquivo, ou ``None``."""
+    for parte in reversed(os.path.normpath(caminho).split(os.sep)[:-1]):
+        encontrado = _DIRETORIO_ANO.fullmatch(parte)
+        if encontrado:
+            return int(encontrado.group(1))
+    return None
+
+
+def completar_ano(df, caminho):
+    """Preenche ``Ano`` pelo diretório da partição quando o arquivo não a traz."""
+    if "Ano" not in df.columns:
+        ano = ano_da_particao(caminho)
+        if ano is not None:
+            df = df.assign(Ano=ano)
+    return df
+
+
+def _cabe_em_int32(serie):
+    limites = np.iinfo(np.int32)
+    return serie.empty or (limites.min <= serie.min() and serie.max() <= limites.max)
+
+
+def compactar(df, tipo_quantidade="int32"):
+    """Converte um frame no esquema da base para os tipos compactos.
+
+    ``Quantidade`` só é reduzida a int32 se todos os valores couberem; caso
+    contrário fica em int64, em vez de estourar em silêncio.
+    """
+    df = df.copy()
+    df["Quantidade"] = pd.to_numeric(df["Quantidade"], errors="coerce")
+    df["Ano"] = pd.to_numeric(df["Ano"], errors="coerce")
+    df = df.dropna(subset=["Quantidade", "Ano"])
+    for col, tipo in TIPOS_TEXTO.items():
+        df[col] = df[col].astype(tipo)
+    df["Ano"] = df["Ano"].astype("int16")
+    if tipo_quantidade == "int32" and not _cabe_em_int32(df["Quantidade"]):
+        logger.warning("Quantidade fora do intervalo de int32 (máximo %s); mantida em int64", df["Quantidade"].max())
+        tipo_quantidade = "int64"
+    df["Quantidade"] = df["Quantidade"].astype(tipo_quantidade)
+    return df.reset_index(drop=True)
+
+
+def ler_csv(caminho=CAMINHO_BASE):
+    colunas = pd.read_csv(caminho, nrows=0).columns
+    validar_colunas(completar_ano(pd.DataFrame(columns=colunas), caminho).columns)
+    df = pd.read_csv(caminho, usecols=[c for c in COLUNAS_NECESSARIAS if c in colunas], dtype=TIPOS_TEXTO)
+    return compactar(completar_ano(df, caminho))
+
+
+def agregar_celulas(df):
+    """Totais de ``Quantidade`` e ``Linhas`` por célula região × ano × tipo."""
+    if "Linhas" not in df.columns:
+        df = df.assign(Linhas=1)
+    return (
+        df.groupby(CHAVES_CELULA, observed=True, sort=False)[["Quantidade", "Linhas"]]
+        .sum()
+        .reset_index()
+    )
+
+
+def anos_diferentes(antigas, novas):
+    """Anos cujas células (totais e contagens) mudaram entre duas agregações."""
+    chaves = {"Regiao": str, "Tipo_Crime": str, "Ano": int}
+    juntas = antigas.astype(chaves).merge(
+        novas.astype(chaves), on=CHAVES_CELULA, how="outer", suffixes=("_a", "_n"), indicator=True
+    )
+    mudou = (
+        (juntas["_merge"] != "both")
+        | (juntas["Quantidade_a"] != juntas["Quantidade_n"])
+        | (juntas["Linhas_a"] != juntas["Linhas_n"])
+    )
+    return set(juntas.loc[mudou, "Ano"].astype(int).tolist())
+
+
+def ingerir_em_blocos(caminho=CAMINHO_BASE, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê o CSV em blocos e devolve só os totais por célula região × ano × tipo.
+
+    O pico de memória é limitado pelo tamanho do bloco mais o número de
+    células distintas, e não pelo tamanho do arquivo.
+    """
+    parciais = []
+    leitor = pd.read_csv(caminho, chunksize=tamanho_bloco, dtype=TIPOS_TEXTO)
+    for numero, bloco in enumerate(leitor):
+        bloco = completar_ano(bloco, caminho)
+        try:
+            validar_colunas(bloco.columns)
+        except ValueError as e:
+            raise ValueError(f"{e} (bloco {numero})") from None
+        bloco = compactar(bloco[COLUNAS_NECESSARIAS])
+        bloco["Linhas"] = 1
+        # Categorias de blocos diferentes não coincidem: depois de agregado
+        # (poucas linhas) o parcial passa a ter chaves de texto.
+        parciais.append(agregar_celulas(bloco).astype({"Regiao": str, "Tipo_Crime": str}))
+        if len(parciais) >= 16:
+            parciais = [agregar_celulas(pd.concat(parciais))]
+
+    if parciais:
+        acumulado = agregar_celulas(pd.concat(parciais))
+    else:
+        acumulado = pd.DataFrame(columns=COLUNAS_NECESSARIAS + ["Linhas"])
+    acumulado = acumulado.astype({"Quantidade": "int64", "Linhas": "int64"})
+    # Somas de muitos registros podem passar de int32: os totais ficam em int64.
+    return compactar(acumulado[["Regiao", "Ano", "Quantidade", "Tipo_Crime", "Linhas"]], tipo_quantidade="int64")
+
+
+def modo_ingestao(caminho, modo=None):
+    modo = modo or os.environ.get("PAINEL_INGESTAO", "auto")
+    if modo == "auto":
+        return "blocos" if os.path.getsize(caminho) > LIMITE_LEITURA_COMPLETA else "completa"
+    if modo not in ("completa", "blocos"):
+        raise ValueError(f"Modo de ingestão desconhecido: '{modo}'")
+    return modo
+
+
+def _ler_sidecar(caminho, sufixo=""):
+    _, arquivo, meta = _caminhos_sidecar(caminho, sufixo)
+    if not (os.path.exists(arquivo) and os.path.exists(meta)):
+        return None
+    with open(meta, encoding="utf-8") as f:
+        chave = json.load(f)
+
+    stat = os.stat(caminho)
+    if (chave.get("mtime_ns"), chave.get("tamanho")) != (stat.st_mtime_ns, stat.st_size):
+        # mtime mudou: só reaproveita se o conteúdo for o mesmo.
+        if chave.get("sha256") != _hash_arquivo(caminho):
+            return None
+        chave.update(mtime_ns=stat.st_mtime_ns, tamanho=stat.st_size)
+        _gravar_json(meta, chave)
+
+    return pd.read_parquet(arquivo)
+
+
+def _gravar_json(destino, conteudo):
+    temporario = destino + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f)
+    os.replace(temporario, destino)
+
+
+def _gravar_sidecar(caminho, df, sufixo=""):
+    pasta, arquivo, meta = _caminhos_sidecar(caminho, sufixo)
+    stat = os.stat(caminho)
+    os.makedirs(pasta, exist_ok=True)
+    temporario = arquivo + ".tmp"
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, arquivo)
+    _gravar_json(meta, {
+        "mtime_ns": stat.st_mtime_ns,
+        "tamanho": stat.st_size,
+        "sha256": _hash_arquivo(caminho),
+    })
+
+
+def carregar_base(caminho=CAMINHO_BASE, usar_sidecar=True, modo=None):
+    """Lê a base no formato compacto, usando o sidecar binário quando válido.
+
+    ``modo`` é ``"completa"`` (uma linha por registro do CSV), ``"blocos"``
+    (totais por célula, ingeridos em blocos) ou ``"auto"``, que escolhe
+    pelo tamanho do arquivo; o padrão vem de ``PAINEL_INGESTAO``.
+    """
+    modo = modo_ingestao(caminho, modo)
+    sufixo = ".celulas" if modo == "blocos" else ""
+    if usar_sidecar:
+        try:
+            df = _ler_sidecar(caminho, sufixo)
+            if df is not None:
+                return df
+        except FileNotFoundError:
+            raise
+        except (ImportError, OSError, ValueError) as e:
+            logger.warning("Sidecar de %s ignorado: %s", caminho, e)
+
+    df = ingerir_em_blocos(caminho) if modo == "blocos" else ler_csv(caminho)
+
+    if usar_sidecar:
+        try:
+            _gravar_sidecar(caminho, df, sufixo)
+        except (ImportError, OSError, ValueError) as e:
+            logger.warning("Não foi possível gravar o sidecar de %s: %s", caminho, e)
+    return df
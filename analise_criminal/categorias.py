@@ -0,0 +1,68 @@
+"""Categorização dos tipos de crime a partir de uma tabela declarativa.
+
+As regras (palavra-chave → categoria, em ordem de prioridade) ficam em
+``regras_categorias.json``; novos tipos de crime são cobertos editando a
+tabela, ou apontando ``PAINEL_REGRAS_CATEGORIAS`` para outro arquivo. A
+classificação roda uma vez por valor distinto de ``Tipo_Crime`` e é
+propagada para as linhas pelos códigos da coluna categórica.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_REGRAS = os.path.join(os.path.dirname(__file__), "regras_categorias.json")
+
+
+@dataclass(frozen=True)
+class RegrasCategoria:
+    regras: tuple  # ((categoria, (palavra, ...)), ...) em ordem de prioridade
+    padrao: str
+
+    def classificar(self, crime):
+        c = str(crime).upper()
+        for categoria, palavras in self.regras:
+            if any(x in c for x in palavras):
+                return categoria
+        return self.padrao
+
+
+@lru_cache(maxsize=None)
+def carregar_regras(caminho=None):
+    caminho = caminho or os.environ.get("PAINEL_REGRAS_CATEGORIAS", ARQUIVO_REGRAS)
+    with open(caminho, encoding="utf-8") as f:
+        tabela = json.load(f)
+    return RegrasCategoria(
+        regras=tuple(
+            (r["categoria"], tuple(p.upper() for p in r["palavras"]))
+            for r in tabela["regras"]
+        ),
+        padrao=tabela["padrao"],
+    )
+
+
+def classificar(crime, regras=None):
+    return (regras or carregar_regras()).classificar(crime)
+
+
+def categorizar(tipos, regras=None):
+    """Retorna a série categórica de ``Categoria`` alinhada a ``tipos``."""
+    regras = regras or carregar_regras()
+    if not isinstance(tipos.dtype, pd.CategoricalDtype):
+        tipos = tipos.astype("category")
+
+    rotulos = [regras.classificar(t) for t in tipos.cat.categories]
+    categorias = sorted(set(rotulos) | {regras.padrao})
+    mapa = np.array([categorias.index(r) for r in rotulos] + [categorias.index(regras.padrao)])
+
+    # Código -1 (tipo ausente) cai na última posição do mapa: a categoria padrão.
+    codigos = mapa[tipos.cat.codes.to_numpy()]
+    return pd.Series(
+        pd.Categorical.from_codes(codigos, categories=categorias),
+        index=tipos.index,
+        name="Categoria",
+    )
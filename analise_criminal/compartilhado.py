@@ -0,0 +1,213 @@
+"""Publicação da base em arquivos mapeados em memória, somente leitura.
+
+O estado montado (colunas do frame, cubo e bitsets do índice) é gravado uma
+vez como arquivos ``.npy`` num diretório por versão, e cada processo do
+painel anexa a ele com ``np.load(mmap_mode="r")``. As páginas ficam no cache
+do sistema operacional e são compartilhadas por todos os processos do host;
+as sessões de um processo já compartilham o mesmo objeto via
+``st.cache_resource``. Os arrays do cubo, dos rollups e do índice são
+somente leitura: uma escrita acidental levanta ``ValueError`` em vez de
+alterar os dados das outras sessões. O ``DataFrame`` em si não tem essa
+garantia (o pandas troca a coluna no próprio objeto em vez de escrever no
+array), por isso cada sessão recebe uma cópia rasa com
+``EstadoBase.para_sessao()``; com copy-on-write, escritas nela não chegam
+ao frame compartilhado.
+
+Só diretórios criados aqui são apagados na limpeza: nome de 16 dígitos
+hexadecimais e o arquivo marcador ``.publicacao-painel`` dentro. A
+publicação anterior à atual é mantida, para quem acabou de ler
+``atual.json``, e ``anexar_atual`` relê o ponteiro se a publicação sumir
+no meio da abertura.
+
+Desligado com ``PAINEL_COMPARTILHAR=0``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from analise_criminal.carga import DIRETORIO_SIDECAR
+from analise_criminal.cubo import CuboCriminal
+from analise_criminal.indice import IndiceBitmap
+
+logger = logging.getLogger(__name__)
+
+ATIVO_PADRAO = os.environ.get("PAINEL_COMPARTILHAR", "1").lower() not in ("0", "false", "nao", "não")
+SUBDIRETORIO = "compartilhado"
+PONTEIRO = "atual.json"
+MARCADOR = ".publicacao-painel"
+TENTATIVAS_ANEXAR = 3
+
+_NOME_PUBLICACAO = re.compile(r"[0-9a-f]{16}")
+
+
+def diretorio_padrao(fonte):
+    pasta = os.environ.get("PAINEL_DIRETORIO_COMPARTILHADO")
+    return pasta or os.path.join(os.path.dirname(os.path.abspath(fonte)), DIRETORIO_SIDECAR, SUBDIRETORIO)
+
+
+def _rotulos(array):
+    return [v.item() if isinstance(v, np.generic) else v for v in array]
+
+
+def _nome_publicacao(versao, arquivos):
+    h = hashlib.sha1(versao.encode())
+    h.update(json.dumps(arquivos).encode())
+    return h.hexdigest()[:16]
+
+
+def publicar(estado, arquivos, pasta):
+    """Grava ``estado`` em ``pasta`` e aponta ``atual.json`` para ele.
+
+    ``arquivos`` é a lista ``[caminho, mtime_ns, tamanho, inicio, fim]`` das
+    partições, na ordem das linhas do frame. Devolve o diretório publicado;
+    se outro processo já publicou o mesmo conteúdo, reaproveita o dele.
+    """
+    nome = _nome_publicacao(estado.cubo.versao, arquivos)
+    destino = os.path.join(pasta, nome)
+    if not os.path.exists(os.path.join(destino, "meta.json")):
+        os.makedirs(pasta, exist_ok=True)
+        temporario = tempfile.mkdtemp(prefix=".publicando-", dir=pasta)
+        try:
+            meta = {
+                "versao": estado.cubo.versao,
+                "n_linhas": len(estado.df),
+                "arquivos": arquivos,
+                "colunas": {},
+                "cubo": {},
+                "indice": {},
+            }
+            for col in estado.df.columns:
+                serie = estado.df[col]
+                if isinstance(serie.dtype, pd.CategoricalDtype):
+                    np.save(os.path.join(temporario, f"df.{col}.npy"), serie.array.codes)
+                    meta["colunas"][col] = {"categorias": _rotulos(serie.cat.categories)}
+                elif serie.dtype.kind in "iufb":
+                    np.save(os.path.join(temporario, f"df.{col}.npy"), serie.to_numpy())
+                    meta["colunas"][col] = {}
+                else:
+                    raise TypeError(f"Coluna '{col}' com tipo {serie.dtype} não pode ser publicada")
+
+            cubo = estado.cubo
+            for campo in ("regioes", "anos", "tipos", "categorias_tipo"):
+                meta["cubo"][campo] = _rotulos(getattr(cubo, campo))
+            meta["cubo"]["tipo_anos"] = str(cubo.anos.dtype)
+            np.save(os.path.join(temporario, "cubo.quantidade.npy"), cubo.quantidade)
+            np.save(os.path.join(temporario, "cubo.linhas.npy"), cubo.linhas)
+
+            for col, bitsets in estado.indice.bitsets.items():
+                valores = list(bitsets)
+                matriz = np.stack([bitsets[v] for v in valores]) if valores else np.empty((0, 0), np.uint8)
+                np.save(os.path.join(temporario, f"indice.{col}.npy"), matriz)
+                meta["indice"][col] = _rotulos(valores)
+
+            with open(os.path.join(temporario, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            with open(os.path.join(temporario, MARCADOR), "w", encoding="utf-8"):
+                pass
+            # mkdtemp cria com 0700: workers de outros usuários precisam ler.
+            os.chmod(temporario, 0o755)
+            try:
+                os.rename(temporario, destino)
+            except OSError:
+                # Outro processo publicou o mesmo nome primeiro.
+                if not os.path.exists(os.path.join(destino, "meta.json")):
+                    raise
+        finally:
+            shutil.rmtree(temporario, ignore_errors=True)
+
+    anterior = _publicacao_atual(pasta)
+    ponteiro = os.path.join(pasta, PONTEIRO)
+    with open(ponteiro + f".{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"publicacao": nome}, f)
+    os.replace(ponteiro + f".{os.getpid()}.tmp", ponteiro)
+    _limpar(pasta, manter={nome, anterior})
+    return destino
+
+
+def _publicacao_atual(pasta):
+    try:
+        with open(os.path.join(pasta, PONTEIRO), encoding="utf-8") as f:
+            return json.load(f)["publicacao"]
+    except (OSError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _limpar(pasta, manter):
+    # Processos que ainda mapeiam uma versão antiga continuam lendo-a: no
+    # POSIX o arquivo só some quando o último mapeamento é fechado.
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        if nome in manter or not _NOME_PUBLICACAO.fullmatch(nome):
+            continue
+        # Sem o marcador o diretório não é uma publicação deste módulo.
+        if not os.path.isfile(os.path.join(caminho, MARCADOR)):
+            continue
+        shutil.rmtree(caminho, ignore_errors=True)
+
+
+def _carregar(caminho):
+    return np.load(caminho, mmap_mode="r")
+
+
+def anexar(destino):
+    """Abre uma publicação; devolve ``(EstadoBase, arquivos)`` sem copiar os dados."""
+    from analise_criminal.atualizacao import EstadoBase
+
+    with open(os.path.join(destino, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    colunas = {}
+    for col, info in meta["colunas"].items():
+        valores = _carregar(os.path.join(destino, f"df.{col}.npy"))
+        if "categorias" in info:
+            tipo = pd.CategoricalDtype(info["categorias"])
+            valores = pd.Categorical.from_codes(valores, dtype=tipo, validate=False)
+        colunas[col] = pd.Series(valores, copy=False)
+    df = pd.DataFrame(colunas, copy=False)
+
+    rotulos = meta["cubo"]
+    cubo = CuboCriminal(
+        regioes=np.asarray(rotulos["regioes"], dtype=object),
+        anos=np.asarray(rotulos["anos"], dtype=rotulos["tipo_anos"]),
+        tipos=np.asarray(rotulos["tipos"], dtype=object),
+        categorias_tipo=np.asarray(rotulos["categorias_tipo"], dtype=object),
+        quantidade=_carregar(os.path.join(destino, "cubo.quantidade.npy")),
+        linhas=_carregar(os.path.join(destino, "cubo.linhas.npy")),
+    )
+    if cubo.versao != meta["versao"]:
+        raise ValueError(f"Publicação {destino} inconsistente")
+
+    bitsets = {}
+    for col, valores in meta["indice"].items():
+        matriz = _carregar(os.path.join(destino, f"indice.{col}.npy"))
+        bitsets[col] = {v: matriz[i] for i, v in enumerate(valores)}
+    indice = IndiceBitmap.de_bitsets(meta["n_linhas"], bitsets)
+
+    return EstadoBase(df=df, cubo=cubo, indice=indice), meta["arquivos"]
+
+
+def anexar_atual(pasta):
+    """Publicação apontada por ``atual.json``, ou ``None`` se não houver.
+
+    Se a publicação for removida entre a leitura do ponteiro e a abertura
+    (outro processo publicou e limpou), o ponteiro é relido.
+    """
+    ponteiro = os.path.join(pasta, PONTEIRO)
+    for tentativa in range(TENTATIVAS_ANEXAR):
+        if not os.path.exists(ponteiro):
+            return None
+        with open(ponteiro, encoding="utf-8") as f:
+            nome = json.load(f)["publicacao"]
+        try:
+            return anexar(os.path.join(pasta, nome))
+        except FileNotFoundError:
+            if tentativa == TENTATIVAS_ANEXAR - 1 or _publicacao_atual(pasta) == nome:
+                raise
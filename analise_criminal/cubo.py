@@ -0,0 +1,259 @@
+"""Cubo denso região × ano × tipo de crime.
+
+O formato longo do CSV é convertido uma única vez em dois arrays
+``[regiao, ano, tipo]``: a soma de ``Quantidade`` e o número de linhas de
+origem de cada célula (usado para reproduzir a semântica de "presença" dos
+antigos ``groupby``). Cada rerun do painel só recorta as fatias selecionadas
+e soma ao longo dos eixos, com custo proporcional às células escolhidas e
+não ao número de linhas da base.
+"""
+
+import hashlib
+from dataclasses import dataclass, fields
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+def _codificar(serie):
+    codigos, rotulos = pd.factorize(serie, sort=True)
+    return codigos, np.asarray(rotulos)
+
+
+@dataclass(frozen=True)
+class CuboCriminal:
+    regioes: np.ndarray
+    anos: np.ndarray
+    tipos: np.ndarray
+    categorias_tipo: np.ndarray
+    quantidade: np.ndarray
+    linhas: np.ndarray
+
+    def __post_init__(self):
+        # O cubo é compartilhado entre sessões (e processos, via memmap).
+        for array in (self.regioes, self.anos, self.tipos, self.categorias_tipo, self.quantidade, self.linhas):
+            array.flags.writeable = False
+        # Os rollups dos KPIs são materializados junto com o cubo, na carga.
+        _ = self.rollups
+
+    @cached_property
+    def rollups(self):
+        return construir_rollups(self)
+
+    @cached_property
+    def versao(self):
+        """Impressão digital do conteúdo, usada para versionar caches derivados."""
+        h = hashlib.sha1()
+        for rotulos in (self.regioes, self.anos, self.tipos, self.categorias_tipo):
+            h.update("\x1f".join(map(str, rotulos)).encode())
+        h.update(self.quantidade.tobytes())
+        h.update(self.linhas.tobytes())
+        return h.hexdigest()[:16]
+
+    @property
+    def categorias(self):
+        return np.unique(self.categorias_tipo)
+
+    def tipos_das_categorias(self, categorias):
+        return self.tipos[np.isin(self.categorias_tipo, list(categorias))]
+
+    def _posicoes(self, rotulos, selecao):
+        # Seleção vazia ou ausente significa "todos", como na sidebar.
+        if selecao is None or len(selecao) == 0:
+            return np.arange(len(rotulos))
+        return np.flatnonzero(np.isin(rotulos, list(selecao)))
+
+    def resumo(self, anos=None, categorias=None, tipos=None, regioes=None):
+        """Total, regiões presentes e totais por ano da seleção.
+
+        Usa o menor rollup que cobre as dimensões filtradas; só seleções com
+        tipos e regiões ao mesmo tempo descem ao cubo.
+        """
+        r = self.rollups
+        pos_anos = self._posicoes(self.anos, anos)
+        if tipos:
+            pos_tipos = self._posicoes(self.tipos, tipos)
+            if categorias:
+                pos_tipos = pos_tipos[np.isin(self.categorias_tipo[pos_tipos], list(categorias))]
+            if regioes:
+                recorte = self.recortar(anos, categorias, tipos, regioes)
+                return recorte.total(), recorte.regioes_presentes(), recorte.por_ano()
+            indice = np.ix_(pos_anos, pos_tipos)
+            qtd, lin = r.qtd_ano_tipo[indice], r.lin_ano_tipo[indice]
+            presenca = self.linhas[:, pos_anos][:, :, pos_tipos] > 0
+            presentes = int(presenca.any(axis=(1, 2)).sum())
+        elif regioes or categorias:
+            pos_regioes = self._posicoes(self.regioes, regioes)
+            pos_cat = self._posicoes(r.categorias, categorias)
+            if categorias and not regioes:
+                indice = np.ix_(pos_anos, pos_cat)
+                qtd, lin = r.qtd_ano_categoria[indice], r.lin_ano_categoria[indice]
+                presentes = int(r.presenca[:, pos_anos][:, :, pos_cat].any(axis=(1, 2)).sum())
+            elif categorias:
+                indice = np.ix_(pos_regioes, pos_anos, pos_cat)
+                qtd3, lin3 = r.qtd_regiao_ano_categoria[indice], r.lin_regiao_ano_categoria[indice]
+                qtd, lin = qtd3.sum(axis=0), lin3.sum(axis=0)
+                presentes = int(r.presenca[indice].any(axis=(1, 2)).sum())
+            else:
+                indice = np.ix_(pos_regioes, pos_anos)
+                qtd, lin = r.qtd_ano_regiao[indice].T, r.lin_ano_regiao[indice].T
+                presentes = int((lin > 0).any(axis=0).sum())
+        else:
+            qtd, lin = r.qtd_ano[pos_anos, None], r.lin_ano[pos_anos, None]
+            presentes = int((r.lin_ano_regiao[:, pos_anos] > 0).any(axis=1).sum())
+
+        # ``qtd``/``lin`` ficam como [ano, resto]; anos sem registros saem da série.
+        anos_presentes = lin.sum(axis=1) > 0
+        por_ano = pd.Series(
+            qtd.sum(axis=1)[anos_presentes],
+            index=pd.Index(self.anos[pos_anos][anos_presentes], name="Ano"),
+            name="Quantidade",
+        )
+        return int(qtd.sum()), presentes, por_ano
+
+    def recortar(self, anos=None, categorias=None, tipos=None, regioes=None):
+        pos_tipos = self._posicoes(self.tipos, tipos)
+        if categorias:
+            pos_tipos = pos_tipos[np.isin(self.categorias_tipo[pos_tipos], list(categorias))]
+        pos_regioes = self._posicoes(self.regioes, regioes)
+        pos_anos = self._posicoes(self.anos, anos)
+
+        indice = np.ix_(pos_regioes, pos_anos, pos_tipos)
+        return RecorteCubo(
+            regioes=self.regioes[pos_regioes],
+            anos=self.anos[pos_anos],
+            tipos=self.tipos[pos_tipos],
+            quantidade=self.quantidade[indice],
+            linhas=self.linhas[indice],
+        )
+
+
+@dataclass(frozen=True)
+class RecorteCubo:
+    regioes: np.ndarray
+    anos: np.ndarray
+    tipos: np.ndarray
+    quantidade: np.ndarray
+    linhas: np.ndarray
+
+    def total(self):
+        return int(self.quantidade.sum())
+
+    def regioes_presentes(self):
+        return int((self.linhas.sum(axis=(1, 2)) > 0).sum())
+
+    def _por_eixo(self, rotulos, eixos, nome):
+        presentes = self.linhas.sum(axis=eixos) > 0
+        soma = self.quantidade.sum(axis=eixos)
+        return pd.Series(soma[presentes], index=pd.Index(rotulos[presentes], name=nome), name="Quantidade")
+
+    def por_regiao(self):
+        return self._por_eixo(self.regioes, (1, 2), "Regiao")
+
+    def por_ano(self):
+        return self._por_eixo(self.anos, (0, 2), "Ano")
+
+    def por_tipo(self):
+        return self._por_eixo(self.tipos, (0, 1), "Tipo_Crime")
+
+    def por_ano_tipo(self):
+        presentes = self.linhas.sum(axis=0) > 0
+        soma = self.quantidade.sum(axis=0)
+        pos_ano, pos_tipo = np.nonzero(presentes)
+        return pd.DataFrame({
+            "Ano": self.anos[pos_ano],
+            "Tipo_Crime": self.tipos[pos_tipo],
+            "Quantidade": soma[pos_ano, pos_tipo],
+        })
+
+    def matriz_regiao_ano(self, top_n=10):
+        por_regiao = self.por_regiao()
+        top = np.isin(self.regioes, por_regiao.nlargest(top_n).index)
+        anos_presentes = self.linhas[top].sum(axis=(0, 2)) > 0
+        matriz = self.quantidade[top][:, anos_presentes].sum(axis=2)
+        return pd.DataFrame(
+            matriz,
+            index=pd.Index(self.regioes[top], name="Regiao"),
+            columns=pd.Index(self.anos[anos_presentes], name="Ano"),
+        )
+
+
+@dataclass(frozen=True)
+class Rollups:
+    """Totais (``qtd_*``) e contagens de linhas (``lin_*``) pré-agregados do cubo."""
+
+    categorias: np.ndarray
+    qtd_regiao_ano_categoria: np.ndarray
+    lin_regiao_ano_categoria: np.ndarray
+    presenca: np.ndarray
+    qtd_ano: np.ndarray
+    lin_ano: np.ndarray
+    qtd_ano_categoria: np.ndarray
+    lin_ano_categoria: np.ndarray
+    qtd_ano_regiao: np.ndarray
+    lin_ano_regiao: np.ndarray
+    qtd_ano_tipo: np.ndarray
+    lin_ano_tipo: np.ndarray
+
+
+def construir_rollups(cubo):
+    categorias, cod_categoria = np.unique(cubo.categorias_tipo.astype(str), return_inverse=True)
+    categorias = np.asarray(categorias, dtype=object)
+    # Soma os tipos de cada categoria: [regiao, ano, tipo] -> [regiao, ano, categoria].
+    por_categoria = np.zeros((len(cubo.tipos), len(categorias)), dtype=np.int64)
+    por_categoria[np.arange(len(cubo.tipos)), cod_categoria] = 1
+    qtd_rac = cubo.quantidade @ por_categoria
+    lin_rac = cubo.linhas.astype(np.int64) @ por_categoria
+    rollups = Rollups(
+        categorias=categorias,
+        qtd_regiao_ano_categoria=qtd_rac,
+        lin_regiao_ano_categoria=lin_rac,
+        presenca=lin_rac > 0,
+        qtd_ano=qtd_rac.sum(axis=(0, 2)),
+        lin_ano=lin_rac.sum(axis=(0, 2)),
+        qtd_ano_categoria=qtd_rac.sum(axis=0),
+        lin_ano_categoria=lin_rac.sum(axis=0),
+        qtd_ano_regiao=qtd_rac.sum(axis=2),
+        lin_ano_regiao=lin_rac.sum(axis=2),
+        qtd_ano_tipo=cubo.quantidade.sum(axis=0),
+        lin_ano_tipo=cubo.linhas.sum(axis=0, dtype=np.int64),
+    )
+    # Compartilhados entre sessões como o cubo: somente leitura.
+    for campo in fields(rollups):
+        getattr(rollups, campo.name).flags.writeable = False
+    return rollups
+
+
+def construir_cubo(df):
+    """Monta o cubo a partir do formato longo (Regiao, Ano, Tipo_Crime, Quantidade, Categoria).
+
+    Aceita também a saída agregada de ``ingerir_em_blocos``, com ``Linhas``.
+    """
+    # Linhas sem região não entram no cubo (já eram descartadas do ranking).
+    df = df[df["Regiao"].notna()]
+
+    cod_regiao, regioes = _codificar(df["Regiao"])
+    cod_ano, anos = _codificar(df["Ano"])
+    cod_tipo, tipos = _codificar(df["Tipo_Crime"])
+
+    forma = (len(regioes), len(anos), len(tipos))
+    plano = np.ravel_multi_index((cod_regiao, cod_ano, cod_tipo), forma)
+    tamanho = int(np.prod(forma))
+
+    quantidade = np.bincount(plano, weights=df["Quantidade"].to_numpy(dtype=np.float64), minlength=tamanho)
+    # Bases já agregadas por célula trazem a contagem de registros em ``Linhas``.
+    pesos_linhas = df["Linhas"].to_numpy(dtype=np.float64) if "Linhas" in df.columns else None
+    linhas = np.rint(np.bincount(plano, weights=pesos_linhas, minlength=tamanho))
+
+    categoria_por_tipo = df.drop_duplicates("Tipo_Crime").set_index("Tipo_Crime")["Categoria"]
+    categorias_tipo = np.asarray(categoria_por_tipo.reindex(tipos).to_numpy(), dtype=object)
+
+    return CuboCriminal(
+        regioes=regioes,
+        anos=anos,
+        tipos=tipos,
+        categorias_tipo=categorias_tipo,
+        quantidade=np.rint(quantidade).astype(np.int64).reshape(forma),
+        linhas=linhas.astype(np.int32).reshape(forma),
+    )
@@ -0,0 +1,242 @@
+"""Figuras Plotly do painel com cache das especificações serializadas.
+
+Cada gráfico é construído uma vez por (id do gráfico, versão do cubo,
+assinatura do filtro, tema) e guardado como JSON. Nas visitas seguintes o
+JSON é reidratado sem passar de novo pela introspecção e validação do
+``plotly.express``. O Plotly só é importado quando uma figura é de fato
+construída, para não pesar na partida de processos que não renderizam.
+
+Antes de serializar, cada figura passa por ``compactar``: o JSON é o que
+vai para o navegador a cada interação, então só leva o que o gráfico usa.
+"""
+
+import json
+import os
+
+from analise_criminal.cache import CacheLRU
+
+TEMA_PADRAO = "claro"
+TEMAS = {
+    "claro": {"fonte": "Inter, Source Sans, sans-serif", "fundo": "rgba(0,0,0,0)"},
+}
+
+# Acima deste número de séries a evolução temporal é desenhada em WebGL.
+LIMITE_WEBGL = int(os.environ.get("PAINEL_LIMITE_WEBGL", 20))
+
+
+def figura_ranking(pacote, tema):
+    import plotly.express as px
+
+    fig_rank = px.bar(
+        pacote.ranking,
+        x="Quantidade",
+        y="Regiao",
+        orientation="h",
+        color="Quantidade",
+        color_continuous_scale="Reds",
+        height=500
+    )
+
+    # O rótulo sai do próprio x: sem um array "text" repetindo os valores.
+    fig_rank.update_traces(
+        textposition='outside',
+        texttemplate='%{x:,.0f}',
+        marker_line_width=0
+    )
+
+    fig_rank.update_layout(
+        plot_bgcolor=tema["fundo"],
+        paper_bgcolor=tema["fundo"],
+        margin=dict(l=10, r=10, t=10, b=10),
+        coloraxis_showscale=False,
+        xaxis_title="",
+        yaxis_title="",
+        font=dict(family=tema["fonte"])
+    )
+    return fig_rank
+
+
+def figura_tipos(pacote, tema):
+    import plotly.express as px
+
+    fig_pie = px.pie(
+        pacote.df_tipo,
+        values="Quantidade",
+        names="Tipo_Crime",
+        hole=0.6,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+
+    fig_pie.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        insidetextorientation='radial',
+        pull=0.02
+    )
+
+    fig_pie.update_layout(
+        showlegend=False,
+        margin=dict(l=10, r=10, t=30, b=10),
+        paper_bgcolor=tema["fundo"],
+        font=dict(family=tema["fonte"]),
+        annotations=[dict(text='Total<br>{}'.format(pacote.total), x=0.5, y=0.5, font_size=16, showarrow=False)]
+    )
+    return fig_pie
+
+
+def figura_temporal(pacote, tema):
+    import plotly.express as px
+
+    # Com muitas séries o SVG pesa no navegador; o scattergl não desenha
+    # spline, então a linha passa a ser reta.
+    webgl = pacote.serie_temporal["Tipo_Crime"].nunique() > LIMITE_WEBGL
+    fig_line = px.line(
+        pacote.serie_temporal,
+        x="Ano",
+        y="Quantidade",
+        color="Tipo_Crime",
+        markers=True,
+        line_shape="linear" if webgl else "spline",
+        render_mode="webgl" if webgl else "svg",
+        color_discrete_sequence=px.colors.qualitative.Set1
+    )
+
+    fig_line.update_traces(line_width=3, marker_size=8, opacity=0.7)
+    fig_line.update_layout(
+        plot_bgcolor=tema["fundo"],
+        paper_bgcolor=tema["fundo"],
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(size=10),
+            itemclick="toggle",
+            itemdoubleclick="toggleothers"
+        ),
+        xaxis_title="",
+        yaxis_title="Quantidade de Ocorrências",
+        font=dict(family=tema["fonte"]),
+        hovermode="x unified"
+    )
+    return fig_line
+
+
+def figura_heatmap(pacote, tema):
+    import plotly.express as px
+
+    fig_heat = px.imshow(
+        pacote.pivot,
+        aspect="auto",
+        color_continuous_scale="Reds",
+        labels=dict(color="Ocorrências"),
+        height=400
+    )
+
+    fig_heat.update_layout(
+        margin=dict(l=10, r=10, t=10, b=10),
+        paper_bgcolor=tema["fundo"],
+        font=dict(family=tema["fonte"])
+    )
+    return fig_heat
+
+
+def figura_pareto(pacote, tema):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    pareto = pacote.pareto
+    fig_pareto = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Barras em azul claro
+    fig_pareto.add_trace(
+        go.Bar(x=pareto.index, y=pareto.values, name="Quantidade", marker_color="#4F8BF9"),
+        secondary_y=False
+    )
+
+    # Linha de percentual em laranja
+    fig_pareto.add_trace(
+        go.Scatter(x=pareto.index, y=pacote.pareto_acum.values, name="% Acumulado",
+                   mode='lines+markers', line=dict(color="#FF9F1C", width=3)),
+        secondary_y=True
+    )
+
+    fig_pareto.update_layout(
+        plot_bgcolor=tema["fundo"],
+        paper_bgcolor=tema["fundo"],
+        margin=dict(l=10, r=10, t=10, b=10),
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+        font=dict(family=tema["fonte"]),
+        height=400
+    )
+
+    fig_pareto.update_yaxes(title_text="Quantidade", secondary_y=False)
+    fig_pareto.update_yaxes(title_text="% Acumulado", range=[0, 105], secondary_y=True)
+    fig_pareto.update_xaxes(tickangle=45)
+    return fig_pareto
+
+
+FIGURAS = {
+    "ranking": figura_ranking,
+    "tipos": figura_tipos,
+    "temporal": figura_temporal,
+    "heatmap": figura_heatmap,
+    "pareto": figura_pareto,
+}
+
+def compactar(fig):
+    """Enxuga ``fig`` para o transporte, sem mudar o que é desenhado.
+
+    * o template só leva os estilos dos tipos de trace presentes (o do
+      Streamlit traz estilos de dez tipos, mais da metade do JSON);
+    * arrays de ponto flutuante com valores inteiros viram inteiros, que o
+      Plotly envia como typed array do menor tipo que os comporta.
+    """
+    import numpy as np
+
+    for trace in fig.data:
+        for atributo in ("x", "y", "z", "values"):
+            if atributo not in trace:
+                continue
+            valores = trace[atributo]
+            if (
+                isinstance(valores, np.ndarray)
+                and valores.dtype.kind == "f"
+                and valores.size
+                and np.isfinite(valores).all()
+                and (valores == np.round(valores)).all()
+            ):
+                trace[atributo] = valores.astype(np.int64)
+
+    modelo = fig.layout.template.to_plotly_json()
+    if modelo.get("data"):
+        usados = {trace.type for trace in fig.data}
+        modelo["data"] = {tipo: estilos for tipo, estilos in modelo["data"].items() if tipo in usados}
+        fig.layout.template = modelo
+    return fig
+
+
+CACHE_FIGURAS = CacheLRU(
+    max_entradas=int(os.environ.get("PAINEL_CACHE_FIGURAS", 512)),
+    max_bytes=int(os.environ.get("PAINEL_CACHE_FIGURAS_MB", 64)) * 1024 * 1024,
+    medir=len,
+)
+
+
+def spec_figura(grafico, cubo, assinatura, pacote, tema=TEMA_PADRAO):
+    """JSON da figura ``grafico`` para a seleção, construído só na primeira vez."""
+    return CACHE_FIGURAS.obter(
+        (grafico, cubo.versao, assinatura, tema),
+        lambda: compactar(FIGURAS[grafico](pacote, TEMAS[tema])).to_json(),
+    )
+
+
+def figura(grafico, cubo, assinatura, pacote, tema=TEMA_PADRAO):
+    import plotly.graph_objects as go
+
+    # A especificação em cache já foi validada quando construída.
+    spec = spec_figura(grafico, cubo, assinatura, pacote, tema)
+    return go.Figure(json.loads(spec), _validate=False)
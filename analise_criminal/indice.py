@@ -0,0 +1,86 @@
+"""Índice bitmap das linhas da base para os filtros da sidebar.
+
+Para cada valor de ``Ano``, ``Categoria``, ``Tipo_Crime`` e ``Regiao`` é
+guardado um bitset compactado (``np.packbits``) das linhas que o contêm.
+Uma seleção é resolvida com OR dentro de cada dimensão e AND entre as
+dimensões, terminando num único ``take`` sobre o frame original.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_INDICE = ("Ano", "Categoria", "Tipo_Crime", "Regiao")
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(bits):
+        return int(np.bitwise_count(bits).sum())
+else:
+    _TABELA_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    def _popcount(bits):
+        return int(_TABELA_BITS[bits].sum())
+
+
+class IndiceBitmap:
+    def __init__(self, df, colunas=COLUNAS_INDICE):
+        self.n_linhas = len(df)
+        self._bitsets = {}
+        for col in colunas:
+            codigos, valores = pd.factorize(df[col])
+            bitsets = {}
+            for codigo, valor in enumerate(valores):
+                bits = np.packbits(codigos == codigo)
+                bits.flags.writeable = False
+                bitsets[valor] = bits
+            self._bitsets[col] = bitsets
+        self._todos = np.packbits(np.ones(self.n_linhas, dtype=bool))
+        self._todos.flags.writeable = False
+
+    @classmethod
+    def de_bitsets(cls, n_linhas, bitsets):
+        """Índice sobre bitsets já calculados (ex.: mapeados de um arquivo)."""
+        indice = cls.__new__(cls)
+        indice.n_linhas = n_linhas
+        indice._bitsets = bitsets
+        indice._todos = np.packbits(np.ones(n_linhas, dtype=bool))
+        indice._todos.flags.writeable = False
+        return indice
+
+    @property
+    def bitsets(self):
+        return self._bitsets
+
+    def valores(self, coluna):
+        return list(self._bitsets[coluna])
+
+    def mascara(self, selecoes):
+        """Bitset compactado das linhas que atendem ``{coluna: valores}``.
+
+        Seleções vazias ou ``None`` não restringem a dimensão.
+        """
+        resultado = None
+        for col, valores in selecoes.items():
+            if valores is None or len(valores) == 0:
+                continue
+            bitsets = self._bitsets[col]
+            presentes = [bitsets[v] for v in set(valores) if v in bitsets]
+            if len(presentes) == len(bitsets):
+                # Todos os valores da dimensão marcados: não há o que restringir.
+                continue
+            dimensao = np.zeros_like(self._todos)
+            for bits in presentes:
+                dimensao |= bits
+            if resultado is None:
+                resultado = dimensao
+            else:
+                resultado &= dimensao
+        return self._todos if resultado is None else resultado
+
+    def linhas(self, selecoes):
+        return np.flatnonzero(np.unpackbits(self.mascara(selecoes), count=self.n_linhas))
+
+    def contar(self, selecoes):
+        return _popcount(self.mascara(selecoes))
+
+    def filtrar(self, df, selecoes):
+        return df.take(self.linhas(selecoes))
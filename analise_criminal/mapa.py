@@ -0,0 +1,267 @@
+"""Mapa coroplético das regiões administrativas com geometria pré-simplificada.
+
+O mapa é opcional: nenhum GeoJSON acompanha o repositório. Com o arquivo
+das regiões administrativas em ``geo/regioes_administrativas_df.geojson``
+(ou no caminho de ``PAINEL_GEOJSON``) o painel ganha a aba do mapa; sem
+ele a aba não aparece. Ao carregar o arquivo:
+
+* cada polígono é simplificado por Douglas-Peucker, uma vez para cada nível
+  de detalhe em ``NIVEIS``;
+* o nome de cada feição entra num índice normalizado (sem acento, caixa ou
+  pontuação, com apelidos como "Brasília" → "Plano Piloto") que resolve os
+  nomes de ``Regiao`` da base para o id da geometria.
+
+A figura base de cada nível (polígonos, estilo e layout) é serializada uma
+vez, com um marcador no lugar do array de cores. A cada filtro só os totais
+por região são escritos no lugar do marcador; os polígonos não passam de
+novo pelo Plotly.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from analise_criminal.figuras import CACHE_FIGURAS, TEMA_PADRAO, TEMAS, compactar
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_GEOJSON = os.environ.get("PAINEL_GEOJSON", os.path.join("geo", "regioes_administrativas_df.geojson"))
+CAMPO_NOME = os.environ.get("PAINEL_GEOJSON_CAMPO")
+CAMPOS_NOME = ("nome", "NOME", "ra", "RA", "nome_ra", "NM_RA", "regiao", "Regiao", "name", "NAME")
+
+# Tolerância de Douglas-Peucker, em graus (0,001° ≈ 110 m no DF).
+NIVEIS = {
+    "geral": 0.004,
+    "medio": 0.0015,
+    "detalhado": 0.0004,
+}
+NIVEL_PADRAO = "geral"
+CASAS_DECIMAIS = 5
+
+# Grafias alternativas, já normalizadas, para o nome usado na base.
+APELIDOS = {
+    "brasilia": "plano piloto",
+    "scia": "scia estrutural",
+    "estrutural": "scia estrutural",
+    "sol nascente": "sol nascente por do sol",
+    "por do sol": "sol nascente por do sol",
+    "sudoeste": "sudoeste octogonal",
+    "octogonal": "sudoeste octogonal",
+    "sia setor de industria e abastecimento": "sia",
+}
+
+_MARCADOR_Z = "\x00z\x00"
+
+
+def normalizar_nome(nome):
+    texto = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode().lower()
+    texto = re.sub(r"[^a-z0-9]+", " ", texto).strip()
+    return APELIDOS.get(texto, texto)
+
+
+def douglas_peucker(pontos, tolerancia):
+    """Máscara dos vértices de ``pontos`` (``[n, 2]``) mantidos na simplificação."""
+    n = len(pontos)
+    manter = np.zeros(n, dtype=bool)
+    manter[[0, -1]] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+        a, b = pontos[inicio], pontos[fim]
+        trecho = pontos[inicio + 1:fim]
+        ab = b - a
+        comprimento = np.hypot(ab[0], ab[1])
+        if comprimento == 0:
+            # Anel fechado: o primeiro corte é no vértice mais distante.
+            distancias = np.hypot(trecho[:, 0] - a[0], trecho[:, 1] - a[1])
+        else:
+            distancias = np.abs(ab[0] * (trecho[:, 1] - a[1]) - ab[1] * (trecho[:, 0] - a[0])) / comprimento
+        i = int(distancias.argmax())
+        if distancias[i] > tolerancia:
+            meio = inicio + 1 + i
+            manter[meio] = True
+            pilha.extend(((inicio, meio), (meio, fim)))
+    return manter
+
+
+def _simplificar_anel(anel, tolerancia):
+    pontos = np.asarray(anel, dtype=np.float64)[:, :2]
+    simplificado = pontos[douglas_peucker(pontos, tolerancia)]
+    if len(simplificado) < 4:
+        # Anel menor que a tolerância: fica como está para não sumir.
+        simplificado = pontos
+    return np.round(simplificado, CASAS_DECIMAIS).tolist()
+
+
+def simplificar_geometria(geometria, tolerancia):
+    tipo = geometria["type"]
+    if tipo == "Polygon":
+        coordenadas = [_simplificar_anel(anel, tolerancia) for anel in geometria["coordinates"]]
+    elif tipo == "MultiPolygon":
+        coordenadas = [[_simplificar_anel(anel, tolerancia) for anel in poligono] for poligono in geometria["coordinates"]]
+    else:
+        raise ValueError(f"Geometria '{tipo}' não suportada no mapa")
+    return {"type": tipo, "coordinates": coordenadas}
+
+
+@dataclass(frozen=True)
+class GeometriaRegioes:
+    versao: str
+    ids: tuple
+    nomes: tuple
+    # nível -> FeatureCollection simplificada
+    por_nivel: dict
+    # nome normalizado -> id da feição
+    indice: dict
+    _bases: dict = field(default_factory=dict, repr=False, compare=False)
+    _trava: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def id_de(self, regiao):
+        return self.indice.get(normalizar_nome(regiao))
+
+    def sem_geometria(self, regioes):
+        return [r for r in regioes if self.id_de(r) is None]
+
+    def base(self, nivel, tema=TEMA_PADRAO):
+        """JSON da figura do nível em duas metades, antes e depois do array de cores."""
+        chave = (nivel, tema)
+        with self._trava:
+            if chave not in self._bases:
+                self._bases[chave] = _construir_base(self, nivel, TEMAS[tema])
+            return self._bases[chave]
+
+
+def _nome_feicao(propriedades):
+    if CAMPO_NOME:
+        return propriedades.get(CAMPO_NOME)
+    for campo in CAMPOS_NOME:
+        if propriedades.get(campo):
+            return propriedades[campo]
+    return None
+
+
+def ler_geometrias(caminho):
+    with open(caminho, "rb") as f:
+        bruto = f.read()
+    try:
+        colecao = json.loads(bruto)
+        feicoes = colecao["features"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"GeoJSON inválido em {caminho}: {e}") from None
+
+    ids, nomes, geometrias, indice = [], [], [], {}
+    for posicao, feicao in enumerate(feicoes):
+        nome = _nome_feicao(feicao.get("properties") or {})
+        if nome is None or not feicao.get("geometry"):
+            logger.warning("Feição %d de %s sem nome ou geometria; ignorada", posicao, caminho)
+            continue
+        id_feicao = str(feicao.get("id", posicao))
+        ids.append(id_feicao)
+        nomes.append(str(nome))
+        geometrias.append(feicao["geometry"])
+        indice.setdefault(normalizar_nome(nome), id_feicao)
+    if not ids:
+        raise ValueError(f"Nenhuma região com nome em {caminho} (campos procurados: {', '.join(CAMPOS_NOME)})")
+
+    por_nivel = {
+        nivel: {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "id": i, "properties": {}, "geometry": simplificar_geometria(g, tolerancia)}
+                for i, g in zip(ids, geometrias)
+            ],
+        }
+        for nivel, tolerancia in NIVEIS.items()
+    }
+    return GeometriaRegioes(
+        versao=hashlib.sha1(bruto).hexdigest()[:16],
+        ids=tuple(ids),
+        nomes=tuple(nomes),
+        por_nivel=por_nivel,
+        indice=indice,
+    )
+
+
+_carregadas = {}
+_trava_carga = threading.Lock()
+
+
+def carregar_geometrias(caminho=CAMINHO_GEOJSON):
+    """Geometrias simplificadas do GeoJSON, ou ``None`` se o arquivo não existe.
+
+    O resultado fica em memória enquanto o arquivo não muda (mtime e tamanho).
+    """
+    try:
+        stat = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    chave = (os.path.abspath(caminho), stat.st_mtime_ns, stat.st_size)
+    with _trava_carga:
+        if chave not in _carregadas:
+            _carregadas.clear()
+            _carregadas[chave] = ler_geometrias(caminho)
+        return _carregadas[chave]
+
+
+def _construir_base(geo, nivel, tema):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Choropleth(
+        geojson=geo.por_nivel[nivel],
+        locations=list(geo.ids),
+        z=[0] * len(geo.ids),
+        featureidkey="id",
+        text=list(geo.nomes),
+        colorscale="Reds",
+        marker_line_width=0.5,
+        marker_line_color="white",
+        colorbar=dict(title="Ocorrências", thickness=12),
+        hovertemplate="<b>%{text}</b><br>%{z:,.0f} ocorrências<extra></extra>",
+    ))
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=0, b=0),
+        paper_bgcolor=tema["fundo"],
+        font=dict(family=tema["fonte"]),
+        height=520
+    )
+    spec = json.loads(compactar(fig).to_json())
+    spec["data"][0]["z"] = _MARCADOR_Z
+    antes, depois = json.dumps(spec, separators=(",", ":")).split(json.dumps(_MARCADOR_Z))
+    return antes, depois
+
+
+def cores(geo, por_regiao):
+    """Total de cada feição (``None`` onde a região não está na seleção)."""
+    z = [None] * len(geo.ids)
+    posicao = {i: p for p, i in enumerate(geo.ids)}
+    for regiao, quantidade in por_regiao.items():
+        id_feicao = geo.id_de(regiao)
+        if id_feicao is not None:
+            p = posicao[id_feicao]
+            z[p] = (z[p] or 0) + int(quantidade)
+    return z
+
+
+def spec_mapa(geo, cubo, assinatura, pacote, nivel=NIVEL_PADRAO, tema=TEMA_PADRAO):
+    """JSON do mapa da seleção: a base do nível com o array de cores trocado."""
+    def montar():
+        antes, depois = geo.base(nivel, tema)
+        return antes + json.dumps(cores(geo, pacote.por_regiao)) + depois
+
+    return CACHE_FIGURAS.obter(("mapa", cubo.versao, assinatura, geo.versao, nivel, tema), montar)
+
+
+def figura_mapa(geo, cubo, assinatura, pacote, nivel=NIVEL_PADRAO, tema=TEMA_PADRAO):
+    import plotly.graph_objects as go
+
+    return go.Figure(json.loads(spec_mapa(geo, cubo, assinatura, pacote, nivel, tema)), _validate=False)
@@ -0,0 +1,37 @@
+"""API sem interface do painel: carregar, filtrar e agregar.
+
+Nada aqui importa ``streamlit`` ou ``plotly``; jobs em lote, benchmarks e
+testes usam o mesmo caminho rápido do painel::
+
+    from analise_criminal import nucleo
+
+    estado = nucleo.carregar()
+    pacote = nucleo.agregar(estado, anos=[2024], regioes=["Ceilândia"])
+    linhas = nucleo.filtrar(estado, anos=[2024])
+"""
+
+from analise_criminal.agregados import agregados, assinatura_filtro
+from analise_criminal.atualizacao import montar_estado
+from analise_criminal.carga import CAMINHO_BASE, carregar_base
+
+
+def carregar(*caminhos, usar_sidecar=True, modo=None):
+    """Lê um ou mais CSVs da base e devolve o ``EstadoBase`` (frame, cubo e índice)."""
+    caminhos = caminhos or (CAMINHO_BASE,)
+    return montar_estado([carregar_base(c, usar_sidecar=usar_sidecar, modo=modo) for c in caminhos])
+
+
+def filtrar(estado, anos=None, categorias=None, tipos=None, regioes=None):
+    """Linhas da base que atendem a seleção (vazio ou ``None`` = todos)."""
+    return estado.indice.filtrar(estado.df, {
+        "Categoria": categorias,
+        "Tipo_Crime": tipos,
+        "Ano": anos,
+        "Regiao": regioes,
+    })
+
+
+def agregar(estado, anos=None, categorias=None, tipos=None, regioes=None):
+    """``PacoteAgregados`` da seleção, com o mesmo cache usado pelo painel."""
+    assinatura = assinatura_filtro(estado.cubo, anos=anos, categorias=categorias, tipos=tipos, regioes=regioes)
+    return agregados(estado.cubo, assinatura)
@@ -0,0 +1,135 @@
+"""Instrumentação leve dos reruns do painel.
+
+Cada seção do painel roda dentro de ``perfil.secao(nome)``. Desligado (o
+padrão), ``secao`` devolve sempre o mesmo ``nullcontext`` e o custo é uma
+chamada de função. Ligado (``PAINEL_PERFIL=1`` ou ``?perfil=1`` na URL),
+os tempos do rerun alimentam um histórico por seção compartilhado entre
+sessões do processo (p50/p95) e viram uma linha JSON de log; com
+``PAINEL_LOG_PERFIL`` apontando para um arquivo, as linhas também são
+gravadas nele.
+
+Seções dentro de ``st.fragment`` usam ``fragmento(perfil, nome)``: quando só
+o fragmento reexecuta (troca de aba, paginação), o perfilador do rerun
+completo já foi registrado, e o fragmento ganha um perfilador próprio,
+registrado com a marca ``fragmento`` e total em ``fragmento:<nome>``.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ATIVO_PADRAO = os.environ.get("PAINEL_PERFIL", "").lower() in ("1", "true", "sim")
+ARQUIVO_LOG = os.environ.get("PAINEL_LOG_PERFIL")
+TAMANHO_HISTORICO = int(os.environ.get("PAINEL_PERFIL_HISTORICO", 2000))
+
+_NULO = nullcontext()
+_historico = defaultdict(lambda: deque(maxlen=TAMANHO_HISTORICO))
+_trava = threading.Lock()
+_trava_arquivo = threading.Lock()
+
+
+class _Span:
+    __slots__ = ("perfilador", "nome", "inicio")
+
+    def __init__(self, perfilador, nome):
+        self.perfilador = perfilador
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracao = time.perf_counter() - self.inicio
+        spans = self.perfilador.spans
+        spans[self.nome] = spans.get(self.nome, 0.0) + duracao
+        return False
+
+
+class Perfilador:
+    def __init__(self, ativo=ATIVO_PADRAO, fragmento=None):
+        self.ativo = ativo
+        self.fragmento = fragmento
+        self.spans = {}
+        self.inicio = time.perf_counter()
+        self.registrado = False
+
+    def secao(self, nome):
+        if not self.ativo:
+            return _NULO
+        return _Span(self, nome)
+
+
+def contadores_cache(caches):
+    return {
+        nome: {"acertos": c.acertos, "faltas": c.faltas, "entradas": len(c), "bytes": c.bytes}
+        for nome, c in caches.items()
+    }
+
+
+def registrar_rerun(perfilador, **contexto):
+    """Guarda os tempos do rerun no histórico e emite a linha JSON de log."""
+    if not perfilador.ativo:
+        return None
+    perfilador.registrado = True
+    total = time.perf_counter() - perfilador.inicio
+    with _trava:
+        for nome, duracao in perfilador.spans.items():
+            _historico[nome].append(duracao)
+        _historico["total" if perfilador.fragmento is None else f"fragmento:{perfilador.fragmento}"].append(total)
+
+    registro = {
+        "ts": time.time(),
+        "pid": os.getpid(),
+        **({"fragmento": perfilador.fragmento} if perfilador.fragmento is not None else {}),
+        "total_ms": round(total * 1000, 3),
+        "secoes_ms": {nome: round(d * 1000, 3) for nome, d in perfilador.spans.items()},
+        **contexto,
+    }
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    logger.info(linha)
+    if ARQUIVO_LOG:
+        with _trava_arquivo, open(ARQUIVO_LOG, "a", encoding="utf-8") as f:
+            f.write(linha + "\n")
+    return registro
+
+
+@contextmanager
+def fragmento(perfilador, nome, **contexto):
+    """Perfilador para o corpo de um ``st.fragment``.
+
+    Dentro de um rerun completo devolve o próprio ``perfilador``; num rerun
+    só do fragmento (o do rerun completo já registrado) cria um novo e o
+    registra ao final.
+    """
+    if not perfilador.ativo or not perfilador.registrado:
+        yield perfilador
+        return
+    proprio = Perfilador(ativo=True, fragmento=nome)
+    yield proprio
+    registrar_rerun(proprio, **contexto)
+
+
+def percentis():
+    """p50/p95 por seção, considerando os reruns de todas as sessões do processo."""
+    with _trava:
+        amostras = {nome: np.fromiter(d, dtype=float) for nome, d in _historico.items()}
+    linhas = [
+        {
+            "Seção": nome,
+            "Reruns": len(v),
+            "p50 (ms)": round(float(np.percentile(v, 50)) * 1000, 2),
+            "p95 (ms)": round(float(np.percentile(v, 95)) * 1000, 2),
+        }
+        for nome, v in amostras.items() if len(v)
+    ]
+    return pd.DataFrame(linhas, columns=["Seção", "Reruns", "p50 (ms)", "p95 (ms)"])
@@ -0,0 +1,179 @@
+"""Geração em lote de relatórios HTML por região e ano.
+
+Reaproveita as agregações e as figuras do painel: cada relatório traz os
+KPIs e a distribuição por tipo da região no ano, a tendência da região até
+aquele ano e, como contexto, o ranking, o heatmap e o Pareto de todas as
+regiões. A base é lida uma vez no processo principal; os workers recebem só
+o cubo. Os arquivos são gravados de forma atômica e os já existentes são
+pulados, então uma execução interrompida continua de onde parou.
+
+Uso::
+
+    python -m analise_criminal.relatorios --anos 2024 --processos 8
+    python -m analise_criminal.relatorios --regioes Ceilândia Gama --saida relatorios
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from analise_criminal.agregados import agregados, assinatura_filtro, indicadores
+from analise_criminal.atualizacao import BaseIncremental
+from analise_criminal.carga import CAMINHO_BASE
+from analise_criminal.figuras import TEMA_PADRAO, spec_figura
+
+DIRETORIO_SAIDA = "relatorios"
+ARQUIVO_PLOTLYJS = "plotly.min.js"
+
+_cubo = None
+
+
+def nome_arquivo(regiao):
+    texto = unicodedata.normalize("NFKD", str(regiao)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-") or "regiao"
+
+
+def caminho_relatorio(saida, regiao, ano):
+    return os.path.join(saida, str(ano), nome_arquivo(regiao) + ".html")
+
+
+def _iniciar(cubo):
+    global _cubo
+    _cubo = cubo
+
+
+def _html_figura(grafico, assinatura):
+    import plotly.graph_objects as go
+
+    spec = spec_figura(grafico, _cubo, assinatura, agregados(_cubo, assinatura), TEMA_PADRAO)
+    return go.Figure(json.loads(spec), _validate=False).to_html(full_html=False, include_plotlyjs=False)
+
+
+def _kpi(rotulo, valor, detalhe):
+    return (
+        f'<div class="kpi"><div class="rotulo">{rotulo}</div>'
+        f'<div class="valor">{valor}</div><div class="detalhe">{detalhe}</div></div>'
+    )
+
+
+def renderizar(regiao, ano):
+    """HTML completo do relatório de ``regiao`` em ``ano``."""
+    cubo = _cubo
+    anos_ate = [a for a in cubo.anos.tolist() if a <= ano]
+    selecao = assinatura_filtro(cubo, anos=[ano], regioes=[regiao])
+    pacote = agregados(cubo, selecao)
+    if ano - 1 in anos_ate:
+        variacao = indicadores(cubo, assinatura_filtro(cubo, anos=[ano - 1, ano], regioes=[regiao])).variacao
+        texto_variacao = f"{variacao:+.1f}%"
+    else:
+        texto_variacao = "—"
+
+    secoes = [
+        ("🔬 Distribuição por Tipo de Crime", "tipos", selecao),
+        ("📈 Evolução Temporal da Região", "temporal", assinatura_filtro(cubo, anos=anos_ate, regioes=[regiao])),
+        (f"🏆 Ranking das Regiões em {ano}", "ranking", assinatura_filtro(cubo, anos=[ano])),
+        ("🔥 Intensidade por Região e Ano", "heatmap", assinatura_filtro(cubo, anos=anos_ate)),
+        ("📊 Concentração Criminal (Pareto)", "pareto", assinatura_filtro(cubo, anos=[ano])),
+    ]
+    corpo = "\n".join(
+        f'<section><h2>{titulo}</h2>{_html_figura(grafico, assinatura)}</section>'
+        for titulo, grafico, assinatura in secoes
+    )
+    titulo = html.escape(f"{regiao} — {ano}")
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Análise Criminal do DF — {titulo}</title>
+<script src="../{ARQUIVO_PLOTLYJS}"></script>
+<style>
+body {{ font-family: Inter, sans-serif; margin: 2rem auto; max-width: 1100px; color: #1f2937; }}
+.kpis {{ display: flex; gap: 1rem; margin-bottom: 1.5rem; }}
+.kpi {{ flex: 1; border: 1px solid #e5e7eb; border-radius: 12px; padding: 1rem; }}
+.rotulo {{ font-size: .8rem; text-transform: uppercase; color: #6b7280; }}
+.valor {{ font-size: 1.8rem; font-weight: 700; }}
+.detalhe {{ font-size: .8rem; color: #6b7280; }}
+section {{ margin-bottom: 2rem; }}
+</style>
+</head>
+<body>
+<h1>🚔 Análise Criminal do DF — {titulo}</h1>
+<div class="kpis">
+{_kpi("Total de Ocorrências", f"{pacote.total:,}".replace(",", "."), f"Em {ano}")}
+{_kpi("Variação Anual", texto_variacao, f"{ano} vs {ano - 1}")}
+{_kpi("Tipos de Crime", len(pacote.df_tipo), "Com registros no ano")}
+</div>
+{corpo}
+<footer><small>Fonte: Portal da Transparência do Governo do Distrito Federal</small></footer>
+</body>
+</html>
+"""
+
+
+def gerar(tarefa):
+    regiao, ano, destino = tarefa
+    inicio = time.perf_counter()
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(renderizar(regiao, ano))
+    os.replace(temporario, destino)
+    return regiao, ano, time.perf_counter() - inicio
+
+
+def _gravar_plotlyjs(saida):
+    destino = os.path.join(saida, ARQUIVO_PLOTLYJS)
+    if not os.path.exists(destino):
+        from plotly.offline import get_plotlyjs
+
+        with open(destino + ".tmp", "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(destino + ".tmp", destino)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fontes", nargs="+", default=[CAMINHO_BASE, os.environ.get("PAINEL_DIRETORIO_DADOS", "dados")],
+                        help="CSVs e diretórios da base (padrão: os mesmos do painel)")
+    parser.add_argument("--regioes", nargs="+", help="regiões a gerar (padrão: todas)")
+    parser.add_argument("--anos", type=int, nargs="+", help="anos a gerar (padrão: todos)")
+    parser.add_argument("--saida", default=DIRETORIO_SAIDA)
+    parser.add_argument("--processos", type=int, default=os.cpu_count())
+    parser.add_argument("--forcar", action="store_true", help="regera relatórios já existentes")
+    args = parser.parse_args(argv)
+
+    cubo = BaseIncremental(args.fontes).estado.cubo
+    regioes = args.regioes or cubo.regioes.tolist()
+    anos = args.anos or cubo.anos.tolist()
+    desconhecidas = sorted(set(regioes) - set(cubo.regioes.tolist())) + sorted(set(anos) - set(cubo.anos.tolist()))
+    if desconhecidas:
+        parser.error(f"não existem na base: {', '.join(map(str, desconhecidas))}")
+
+    # Ordenadas por ano: regiões do mesmo ano caem no mesmo worker e
+    # reaproveitam as figuras de contexto do cache de especificações.
+    tarefas = [(r, a, caminho_relatorio(args.saida, r, a)) for a in anos for r in regioes]
+    pendentes = [t for t in tarefas if args.forcar or not os.path.exists(t[2])]
+    print(f"{len(tarefas)} relatórios, {len(tarefas) - len(pendentes)} já existentes", file=sys.stderr)
+    if not pendentes:
+        return
+
+    os.makedirs(args.saida, exist_ok=True)
+    _gravar_plotlyjs(args.saida)
+
+    inicio = time.perf_counter()
+    processos = max(1, min(args.processos or 1, len(pendentes)))
+    lote = max(1, len(pendentes) // (processos * 4))
+    with ProcessPoolExecutor(processos, initializer=_iniciar, initargs=(cubo,)) as executor:
+        for feitos, (regiao, ano, segundos) in enumerate(executor.map(gerar, pendentes, chunksize=lote), 1):
+            print(f"[{feitos}/{len(pendentes)}] {regiao} {ano} ({segundos:.2f}s)", file=sys.stderr)
+    print(f"Concluído em {time.perf_counter() - inicio:.1f}s com {processos} processos", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Backend SQL embarcado para bases maiores que a memória.
+
+Com ``PAINEL_BACKEND=sql`` a base não é carregada no processo: os CSVs são
+ingeridos em blocos numa tabela de um banco local (DuckDB, se instalado, ou
+SQLite) em ``.cache_painel/``, e só o que é pequeno volta para o Python:
+
+* o ``GROUP BY Regiao, Ano, Tipo_Crime`` que alimenta o cubo, de onde saem
+  KPIs e gráficos exatamente como no caminho em memória;
+* a contagem e a página visível da tabela de detalhes, com os filtros da
+  sidebar, a ordenação e o ``LIMIT/OFFSET`` executados no banco.
+
+O banco persiste entre reinícios; cada verificação só faz ``stat`` nos
+arquivos e reingere os que mudaram, como a ``BaseIncremental``.
+
+Vários processos (workers do Streamlit, a API) abrem o mesmo arquivo. O
+DuckDB só admite um processo com o arquivo aberto para escrita: se ele já
+está travado, o motor ``auto`` passa para o SQLite e ``duckdb`` explícito
+falha com ``BancoTravado``. No SQLite as escritas de ingestão esperam a
+trava (``BEGIN IMMEDIATE`` com timeout); se ainda assim o banco estiver
+ocupado, a verificação mantém a versão anterior e tenta de novo depois.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from analise_criminal.atualizacao import INTERVALO_VERIFICACAO, Atualizacao, BaseIncremental
+from analise_criminal.carga import (
+    CHAVES_CELULA,
+    COLUNAS_NECESSARIAS,
+    DIRETORIO_SIDECAR,
+    TAMANHO_BLOCO,
+    TIPOS_TEXTO,
+    anos_diferentes,
+    compactar,
+    completar_ano,
+    validar_colunas,
+)
+from analise_criminal.categorias import carregar_regras, categorizar
+from analise_criminal.cubo import construir_cubo
+from analise_criminal.tabela import TAMANHO_PAGINA, PaginaTabela
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.environ.get("PAINEL_BACKEND", "pandas")
+MOTOR = os.environ.get("PAINEL_MOTOR_SQL", "auto")
+# Segundos que uma escrita no SQLite espera outro processo liberar o banco.
+ESPERA_TRAVA = float(os.environ.get("PAINEL_SQL_ESPERA", 30))
+
+COLUNAS_TABELA = ["Regiao", "Ano", "Quantidade", "Tipo_Crime", "Categoria"]
+# Colunas vindas da sidebar; ``Categoria`` é traduzida para tipos de crime.
+COLUNAS_FILTRO = ("Ano", "Tipo_Crime", "Regiao")
+
+
+def escolher_motor(motor=None):
+    motor = motor or MOTOR
+    if motor == "auto":
+        try:
+            import duckdb  # noqa: F401
+            return "duckdb"
+        except ImportError:
+            return "sqlite"
+    if motor not in ("duckdb", "sqlite"):
+        raise ValueError(f"Motor SQL desconhecido: '{motor}'")
+    return motor
+
+
+class BancoTravado(OSError):
+    """O arquivo do banco está aberto para escrita por outro processo."""
+
+
+class _Banco:
+    """Conexão única ao banco local, serializada por uma trava."""
+
+    def __init__(self, caminho, motor):
+        self.motor = motor
+        self.trava = threading.RLock()
+        if motor == "duckdb":
+            import duckdb
+
+            try:
+                self.con = duckdb.connect(caminho)
+            except duckdb.IOException as e:
+                raise BancoTravado(f"Banco {caminho} em uso por outro processo: {e}") from None
+            # O DuckDB só trava na abertura; depois disso não há espera.
+            self.erros_trava = ()
+        else:
+            import sqlite3
+
+            self.con = sqlite3.connect(caminho, timeout=ESPERA_TRAVA, check_same_thread=False, isolation_level=None)
+            self.con.execute("PRAGMA journal_mode=WAL")
+            self.erros_trava = (sqlite3.OperationalError,)
+        self.executar("CREATE TABLE IF NOT EXISTS arquivos (caminho TEXT PRIMARY KEY, mtime_ns BIGINT, tamanho BIGINT)")
+        self.executar(
+            "CREATE TABLE IF NOT EXISTS base "
+            "(arquivo TEXT, Regiao TEXT, Ano INTEGER, Quantidade BIGINT, Tipo_Crime TEXT)"
+        )
+        self.executar("CREATE INDEX IF NOT EXISTS base_arquivo ON base (arquivo)")
+
+    def iniciar(self):
+        # No SQLite a transação já começa com a trava de escrita: sem isso,
+        # duas ingestões simultâneas podem falhar ao promover a trava.
+        self.executar("BEGIN IMMEDIATE" if self.motor == "sqlite" else "BEGIN")
+
+    def executar(self, sql, parametros=()):
+        with self.trava:
+            return self.con.execute(sql, list(parametros)).fetchall()
+
+    def consultar(self, sql, parametros=()):
+        with self.trava:
+            if self.motor == "duckdb":
+                return self.con.execute(sql, list(parametros)).df()
+            return pd.read_sql_query(sql, self.con, params=list(parametros))
+
+    def inserir(self, df):
+        with self.trava:
+            if self.motor == "duckdb":
+                self.con.register("bloco_ingestao", df)
+                try:
+                    self.con.execute("INSERT INTO base SELECT arquivo, Regiao, Ano, Quantidade, Tipo_Crime FROM bloco_ingestao")
+                finally:
+                    self.con.unregister("bloco_ingestao")
+            else:
+                # ``to_sql`` faria commit no meio da transação da ingestão.
+                linhas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+                self.con.executemany("INSERT INTO base VALUES (?, ?, ?, ?, ?)", linhas)
+
+
+def _blocos_csv(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    leitor = pd.read_csv(caminho, chunksize=tamanho_bloco, dtype=TIPOS_TEXTO)
+    for numero, bloco in enumerate(leitor):
+        bloco = completar_ano(bloco, caminho)
+        try:
+            validar_colunas(bloco.columns)
+        except ValueError as e:
+            raise ValueError(f"{e} (bloco {numero})") from None
+        bloco = compactar(bloco[COLUNAS_NECESSARIAS])
+        yield pd.DataFrame({
+            "arquivo": caminho,
+            "Regiao": bloco["Regiao"].astype(object),
+            "Ano": bloco["Ano"].astype("int64"),
+            "Quantidade": bloco["Quantidade"].astype("int64"),
+            "Tipo_Crime": bloco["Tipo_Crime"].astype(object),
+        })
+
+
+@dataclass(frozen=True)
+class EstadoSQL:
+    """Equivalente do ``EstadoBase`` sem as linhas em memória."""
+
+    cubo: object
+    base: "BaseSQL"
+    categoria_por_tipo: dict
+
+    @property
+    def colunas(self):
+        return list(COLUNAS_TABELA)
+
+    def para_sessao(self):
+        # Sem frame no processo: nada que uma sessão possa alterar.
+        return self
+
+    def _onde(self, selecoes):
+        condicoes, parametros = [], []
+        if selecoes.get("Categoria"):
+            escolhidas = set(selecoes["Categoria"])
+            tipos_categoria = [t for t, c in self.categoria_por_tipo.items() if c in escolhidas]
+            condicoes.append(f"Tipo_Crime IN ({', '.join('?' * len(tipos_categoria)) or 'NULL'})")
+            parametros.extend(tipos_categoria)
+        for col in COLUNAS_FILTRO:
+            valores = selecoes.get(col)
+            if valores is None or len(valores) == 0:
+                continue
+            valores = [int(v) for v in valores] if col == "Ano" else [str(v) for v in valores]
+            condicoes.append(f"{col} IN ({', '.join('?' * len(valores))})")
+            parametros.extend(valores)
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def _expressao_categoria(self):
+        casos = " ".join("WHEN ? THEN ?" for _ in self.categoria_por_tipo)
+        parametros = [v for par in self.categoria_por_tipo.items() for v in par]
+        padrao = carregar_regras().padrao
+        if not casos:
+            return "?", [padrao]
+        return f"CASE Tipo_Crime {casos} ELSE ? END", parametros + [padrao]
+
+    def contar(self, selecoes):
+        onde, parametros = self._onde(selecoes)
+        return int(self.base.banco.executar(f"SELECT COUNT(*) FROM base{onde}", parametros)[0][0])
+
+    def pagina(self, selecoes, coluna="Quantidade", descendente=True, pagina=0, tamanho=TAMANHO_PAGINA, colunas=None):
+        """Mesma página que ``paginar`` produziria sobre as linhas em memória."""
+        colunas = list(colunas) if colunas else self.colunas
+        if coluna not in COLUNAS_TABELA or any(c not in COLUNAS_TABELA for c in colunas):
+            raise ValueError(f"Coluna desconhecida na tabela de detalhes: {coluna}, {colunas}")
+
+        total = self.contar(selecoes)
+        paginas = max(1, math.ceil(total / tamanho))
+        pagina = min(max(pagina, 0), paginas - 1)
+        inicio = pagina * tamanho
+
+        onde, parametros_onde = self._onde(selecoes)
+        categoria, parametros_categoria = self._expressao_categoria()
+        selecionadas = ", ".join(f"{categoria} AS Categoria" if c == "Categoria" else c for c in colunas)
+        ordem = categoria if coluna == "Categoria" else coluna
+        # Ausentes vão ao fim e empates seguem a ordem de ingestão, como na
+        # seleção parcial do caminho em memória.
+        sql = (
+            f"SELECT {selecionadas} FROM base{onde} "
+            f"ORDER BY ({ordem}) IS NULL, {ordem} {'DESC' if descendente else 'ASC'}, rowid "
+            f"LIMIT ? OFFSET ?"
+        )
+        # Os parâmetros seguem a ordem em que aparecem no texto do SQL.
+        parametros_select = parametros_categoria if "Categoria" in colunas else []
+        parametros_ordem = parametros_categoria * 2 if coluna == "Categoria" else []
+        linhas = self.base.banco.consultar(sql, parametros_select + parametros_onde + parametros_ordem + [tamanho, inicio])
+        return PaginaTabela(linhas=linhas, total=total, pagina=pagina, paginas=paginas, inicio=inicio)
+
+
+class BaseSQL:
+    """Base mantida num banco local, com a mesma interface da ``BaseIncremental``."""
+
+    def __init__(self, fontes, intervalo=INTERVALO_VERIFICACAO, motor=None, caminho_banco=None):
+        self.fontes = list(fontes)
+        self.intervalo = intervalo
+        # O recorte por ano (``BaseIncremental(anos=...)``) é só da base em memória.
+        self.anos = None
+        self.motor = escolher_motor(motor)
+        try:
+            self.banco = _Banco(caminho_banco or self._caminho_padrao(), self.motor)
+        except BancoTravado as e:
+            if (motor or MOTOR) != "auto" or caminho_banco is not None:
+                raise
+            # Outro processo já é dono do arquivo DuckDB; o SQLite aceita
+            # vários processos no mesmo arquivo.
+            logger.warning("%s; usando SQLite", e)
+            self.motor = "sqlite"
+            self.banco = _Banco(self._caminho_padrao(), self.motor)
+        self._trava = threading.Lock()
+        self._ultima_verificacao = 0.0
+        self._celulas = None
+        self.estado = None
+        self.atualizar(forcar=True)
+
+    arquivos = BaseIncremental.arquivos
+
+    def _caminho_padrao(self):
+        pasta = os.path.join(os.path.dirname(os.path.abspath(self.fontes[0])), DIRETORIO_SIDECAR)
+        os.makedirs(pasta, exist_ok=True)
+        return os.path.join(pasta, f"base.{self.motor}")
+
+    def _ingerir(self, caminho, stat):
+        banco = self.banco
+        with banco.trava:
+            banco.iniciar()
+            try:
+                banco.executar("DELETE FROM base WHERE arquivo = ?", [caminho])
+                for bloco in _blocos_csv(caminho):
+                    banco.inserir(bloco)
+                banco.executar("DELETE FROM arquivos WHERE caminho = ?", [caminho])
+                banco.executar("INSERT INTO arquivos VALUES (?, ?, ?)", [caminho, stat.st_mtime_ns, stat.st_size])
+                banco.executar("COMMIT")
+            except BaseException:
+                banco.executar("ROLLBACK")
+                raise
+
+    def _remover(self, caminho):
+        banco = self.banco
+        with banco.trava:
+            banco.iniciar()
+            try:
+                banco.executar("DELETE FROM base WHERE arquivo = ?", [caminho])
+                banco.executar("DELETE FROM arquivos WHERE caminho = ?", [caminho])
+                banco.executar("COMMIT")
+            except BaseException:
+                banco.executar("ROLLBACK")
+                raise
+
+    def celulas(self):
+        """Totais por célula região × ano × tipo, agregados no banco."""
+        celulas = self.banco.consultar(
+            "SELECT Regiao, Ano, Tipo_Crime, SUM(Quantidade) AS Quantidade, COUNT(*) AS Linhas FROM base "
+            "WHERE Regiao IS NOT NULL AND Tipo_Crime IS NOT NULL GROUP BY Regiao, Ano, Tipo_Crime"
+        )
+        return celulas.astype({
+            "Regiao": "category", "Tipo_Crime": "category",
+            "Ano": "int16", "Quantidade": "int64", "Linhas": "int64",
+        })
+
+    def atualizar(self, forcar=False):
+        """Reingere os arquivos alterados; devolve ``Atualizacao`` ou ``None``."""
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_verificacao < self.intervalo:
+            return None
+
+        with self._trava:
+            if not forcar and agora - self._ultima_verificacao < self.intervalo:
+                return None
+            self._ultima_verificacao = agora
+
+            arquivos = self.arquivos()
+            if not arquivos:
+                raise FileNotFoundError(f"Nenhum arquivo de dados em {self.fontes}")
+
+            registrados = {c: (m, t) for c, m, t in self.banco.executar("SELECT caminho, mtime_ns, tamanho FROM arquivos")}
+            mudou = False
+            for caminho in arquivos:
+                stat = os.stat(caminho)
+                if registrados.get(caminho) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    self._ingerir(caminho, stat)
+                    mudou = True
+                except (OSError, ValueError, *self.banco.erros_trava) as e:
+                    if caminho not in registrados and self.estado is None:
+                        raise
+                    # Arquivo em escrita, inválido ou banco ocupado por outro
+                    # processo: mantém a versão anterior.
+                    logger.warning("Arquivo %s não reingerido: %s", caminho, e)
+            for caminho in registrados.keys() - set(arquivos):
+                try:
+                    self._remover(caminho)
+                    mudou = True
+                except self.banco.erros_trava as e:
+                    logger.warning("Arquivo %s não removido do banco: %s", caminho, e)
+
+            if self.estado is not None and not mudou:
+                return None
+
+            celulas = self.celulas()
+            anos_afetados = anos_diferentes(self._celulas, celulas) if self._celulas is not None else set(celulas["Ano"].astype(int))
+            if self.estado is not None and not anos_afetados:
+                return None
+            self._celulas = celulas
+
+            versao_antiga = self.estado.cubo.versao if self.estado is not None else None
+            self.estado = self._montar_estado(celulas)
+            logger.info("Base SQL (%s) atualizada; anos afetados: %s", self.motor, sorted(anos_afetados))
+            return Atualizacao(versao_antiga, self.estado.cubo.versao, frozenset(anos_afetados))
+
+    def _montar_estado(self, celulas):
+        celulas = celulas.assign(Categoria=categorizar(celulas["Tipo_Crime"]))
+        tipos = pd.Series(
+            [t for (t,) in self.banco.executar("SELECT DISTINCT Tipo_Crime FROM base WHERE Tipo_Crime IS NOT NULL")],
+            dtype="category",
+        )
+        categoria_por_tipo = dict(zip(tipos.astype(str), categorizar(tipos).astype(str)))
+        return EstadoSQL(cubo=construir_cubo(celulas), base=self, categoria_por_tipo=categoria_por_tipo)
+
+
+def abrir_base(fontes, backend=None):
+    """Base das ``fontes`` no backend escolhido (``PAINEL_BACKEND``): ``BaseSQL`` ou ``BaseIncremental``.
+
+    Painel e API passam por aqui para servir sempre o mesmo backend.
+    """
+    if (backend or BACKEND) == "sql":
+        return BaseSQL(fontes)
+    return BaseIncremental(fontes)
@@ -0,0 +1,74 @@
+"""Paginação da tabela de detalhes com ordenação feita no servidor.
+
+Só a página pedida é materializada e enviada ao navegador. A primeira
+página (e qualquer página no começo da ordem) sai de uma seleção parcial
+dos ``k`` primeiros com ``np.partition``, sem ordenar o recorte inteiro;
+empates são desfeitos pela posição da linha, então as páginas não se
+sobrepõem nem pulam linhas.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+TAMANHO_PAGINA = int(os.environ.get("PAINEL_TAMANHO_PAGINA", 50))
+TAMANHOS_PAGINA = (25, 50, 100, 250)
+
+
+@dataclass(frozen=True)
+class PaginaTabela:
+    linhas: pd.DataFrame
+    total: int
+    pagina: int
+    paginas: int
+    inicio: int
+
+
+def _chave_ordenacao(serie, posicoes, descendente):
+    # A direção é aplicada antes de marcar os ausentes: eles vão ao fim nas
+    # duas ordens, como o NULLS LAST do backend SQL.
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Ordena pelo rótulo, não pela ordem das categorias.
+        ranque = np.argsort(np.argsort(serie.cat.categories.to_numpy(dtype=str))).astype(np.int64)
+        codigos = serie.cat.codes.to_numpy()[posicoes]
+        # O código -1 (ausente) cai no 0 acrescentado, sobrescrito abaixo.
+        chave = np.append(ranque, 0)[codigos]
+        chave = -chave if descendente else chave
+        chave[codigos < 0] = len(ranque)
+        return chave
+    chave = serie.to_numpy()[posicoes]
+    if chave.dtype.kind in "iub":
+        return -chave.astype(np.int64) if descendente else chave.astype(np.int64)
+    chave = chave.astype(np.float64)
+    chave = -chave if descendente else chave
+    chave[np.isnan(chave)] = np.inf
+    return chave
+
+
+def _primeiros(chave, k):
+    """Posições (em ``chave``) dos ``k`` menores, em ordem, empates pela posição."""
+    if k >= len(chave):
+        return np.lexsort((np.arange(len(chave)), chave))
+    corte = np.partition(chave, k - 1)[k - 1]
+    menores = np.flatnonzero(chave < corte)
+    iguais = np.flatnonzero(chave == corte)[:k - len(menores)]
+    candidatos = np.concatenate([menores, iguais])
+    return candidatos[np.lexsort((candidatos, chave[candidatos]))]
+
+
+def paginar(df, posicoes, coluna="Quantidade", descendente=True, pagina=0, tamanho=TAMANHO_PAGINA, colunas=None):
+    """Página ``pagina`` (a partir de 0) das linhas ``posicoes`` de ``df``.
+
+    ``colunas`` projeta o resultado; ``None`` mantém todas as colunas.
+    """
+    total = len(posicoes)
+    paginas = max(1, math.ceil(total / tamanho))
+    pagina = min(max(pagina, 0), paginas - 1)
+    inicio = pagina * tamanho
+    ordem = _primeiros(_chave_ordenacao(df[coluna], posicoes, descendente), min(inicio + tamanho, total))
+    selecionadas = posicoes[ordem[inicio:]]
+    linhas = df.iloc[selecionadas] if colunas is None else df.iloc[selecionadas][list(colunas)]
+    return PaginaTabela(linhas=linhas, total=total, pagina=pagina, paginas=paginas, inicio=inicio)
@@ -0,0 +1,108 @@
+"""Tendência e anomalia de todas as séries região × tipo de crime de uma vez.
+
+As séries saem do cubo como uma matriz ``[série, ano]`` e todas as
+estatísticas são operações matriciais sobre o eixo dos anos, sem laço por
+série:
+
+* inclinação da reta de mínimos quadrados (ocorrências/ano) e a mesma
+  inclinação relativa à média da série (% ao ano);
+* variação do último ano contra o anterior;
+* z-score do último ano contra o histórico anterior a ele.
+"""
+
+import numpy as np
+import pandas as pd
+
+from analise_criminal.agregados import CACHE_AGREGADOS, assinatura_filtro
+
+COLUNAS = [
+    "Regiao", "Tipo_Crime", "Categoria", "Ultimo_Ano", "Media_Historica",
+    "Tendencia", "Tendencia_Pct", "Variacao_Pct", "Z_Score",
+]
+
+
+def pontuar(anos, quantidade):
+    """Estatísticas de cada linha de ``quantidade`` (``[série, ano]``, anos em ordem)."""
+    y = quantidade.astype(np.float64)
+    n_series, n_anos = y.shape
+    nan = np.full(n_series, np.nan)
+    if n_anos == 0:
+        return {"ultimo": nan, "media": nan, "tendencia": nan, "tendencia_pct": nan, "variacao_pct": nan, "z": nan}
+
+    x = np.asarray(anos, dtype=np.float64)
+    x = x - x.mean()
+    media = y.mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tendencia = (y @ x) / (x @ x) if n_anos >= 2 else nan
+        tendencia_pct = np.where(media > 0, tendencia / media * 100, np.nan)
+
+        ultimo = y[:, -1]
+        if n_anos >= 2:
+            anterior = y[:, -2]
+            variacao_pct = np.where(anterior > 0, (ultimo - anterior) / anterior * 100, np.nan)
+        else:
+            variacao_pct = nan
+
+        historico = y[:, :-1]
+        if historico.shape[1] >= 2:
+            desvio = historico.std(axis=1, ddof=1)
+            z = np.where(desvio > 0, (ultimo - historico.mean(axis=1)) / desvio, np.nan)
+        else:
+            z = nan
+    return {
+        "ultimo": ultimo,
+        "media": media,
+        "tendencia": tendencia,
+        "tendencia_pct": tendencia_pct,
+        "variacao_pct": variacao_pct,
+        "z": z,
+    }
+
+
+def calcular_tendencias(cubo, assinatura):
+    recorte = cubo.recortar(
+        anos=assinatura.anos,
+        categorias=assinatura.categorias,
+        tipos=assinatura.tipos,
+        regioes=assinatura.regioes,
+    )
+    # [regiao, ano, tipo] -> [regiao × tipo, ano]
+    quantidade = recorte.quantidade.transpose(0, 2, 1).reshape(-1, len(recorte.anos))
+    presentes = recorte.linhas.transpose(0, 2, 1).reshape(-1, len(recorte.anos)).sum(axis=1) > 0
+    estatisticas = pontuar(recorte.anos, quantidade[presentes])
+
+    pos_regiao, pos_tipo = np.divmod(np.flatnonzero(presentes), len(recorte.tipos))
+    # Os tipos do cubo estão ordenados: a posição de cada tipo do recorte no
+    # cubo indexa direto ``categorias_tipo``.
+    pos_tipo_cubo = np.searchsorted(cubo.tipos, recorte.tipos)
+    return pd.DataFrame({
+        "Regiao": recorte.regioes[pos_regiao],
+        "Tipo_Crime": recorte.tipos[pos_tipo],
+        "Categoria": np.take(cubo.categorias_tipo, pos_tipo_cubo[pos_tipo]),
+        "Ultimo_Ano": estatisticas["ultimo"].astype(np.int64),
+        "Media_Historica": estatisticas["media"].round(1),
+        "Tendencia": estatisticas["tendencia"].round(2),
+        "Tendencia_Pct": estatisticas["tendencia_pct"].round(1),
+        "Variacao_Pct": estatisticas["variacao_pct"].round(1),
+        "Z_Score": estatisticas["z"].round(2),
+    }, columns=COLUNAS)
+
+
+def tendencias(cubo, assinatura):
+    """Séries pontuadas da seleção, usando todo o histórico até o último ano escolhido.
+
+    O cache usa a assinatura com os anos do histórico, para que a
+    atualização de qualquer ano usado no cálculo invalide a entrada.
+    """
+    ultimo = max(assinatura.anos) if assinatura.anos else cubo.anos.max()
+    historico = assinatura_filtro(
+        cubo,
+        anos=cubo.anos[cubo.anos <= ultimo].tolist(),
+        categorias=assinatura.categorias,
+        tipos=assinatura.tipos,
+        regioes=assinatura.regioes,
+    )
+    return CACHE_AGREGADOS.obter(
+        ("tendencias", cubo.versao, historico),
+        lambda: calcular_tendencias(cubo, historico),
+    )
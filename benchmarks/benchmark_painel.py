@@ -0,0 +1,197 @@
+"""Benchmark das etapas do painel sobre bases sintéticas.
+
+Gera CSVs no mesmo esquema da base (``Regiao, Ano, Quantidade, Tipo_Crime``)
+e mede separadamente leitura, categorização, filtragem da sidebar, cada
+agregação dos gráficos e a construção das figuras. O resultado sai em JSON,
+com tempo e pico de memória (tracemalloc) por etapa e o RSS máximo do
+processo, para acompanhar regressões.
+
+Uso::
+
+    python benchmarks/benchmark_painel.py --linhas 10000 1000000 10000000 --saida bench.json
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analise_criminal.agregados import assinatura_filtro, calcular_agregados  # noqa: E402
+from analise_criminal.carga import agregar_celulas, carregar_base  # noqa: E402
+from analise_criminal.categorias import categorizar  # noqa: E402
+from analise_criminal.cubo import construir_cubo  # noqa: E402
+from analise_criminal.indice import IndiceBitmap  # noqa: E402
+from analise_criminal.tendencias import calcular_tendencias  # noqa: E402
+
+TIPOS_BASE = [
+    "Furto em Veículo",
+    "Homicídio",
+    "LCSM (Lesão Corporal Seguida de Morte)",
+    "Latrocínio",
+    "Roubo a Transeunte",
+    "Roubo de Veículo",
+    "Roubo em Comércio",
+    "Roubo em Transporte Coletivo",
+]
+PREFIXOS_EXTRAS = ["Roubo", "Furto", "Tráfico de Drogas", "Estelionato", "Homicídio"]
+
+
+def nomes_tipos(n_tipos):
+    extras = [f"{PREFIXOS_EXTRAS[i % len(PREFIXOS_EXTRAS)]} sintético {i}" for i in range(max(0, n_tipos - len(TIPOS_BASE)))]
+    return (TIPOS_BASE + extras)[:n_tipos]
+
+
+def gerar_base(n_regioes=35, n_anos=10, n_tipos=8, multiplicidade=1, semente=0):
+    """Base sintética com ``n_regioes × n_anos × n_tipos × multiplicidade`` linhas.
+
+    ``multiplicidade`` repete cada célula, como numa extração mais granular
+    (mensal, diária ou por ocorrência).
+    """
+    rng = np.random.default_rng(semente)
+    regioes = np.array([f"Região {i:03d}" for i in range(n_regioes)], dtype=object)
+    anos = np.arange(2024 - n_anos + 1, 2025)
+    tipos = np.array(nomes_tipos(n_tipos), dtype=object)
+
+    celulas = n_regioes * n_anos * n_tipos
+    idx = np.tile(np.arange(celulas), multiplicidade)
+    r, a, t = np.unravel_index(idx, (n_regioes, n_anos, n_tipos))
+    return pd.DataFrame({
+        "Regiao": regioes[r],
+        "Ano": anos[a],
+        "Quantidade": rng.poisson(20, size=len(idx)),
+        "Tipo_Crime": tipos[t],
+    })
+
+
+class Medidor:
+    def __init__(self, repeticoes=3, memoria=True):
+        self.repeticoes = repeticoes
+        self.memoria = memoria
+        self.etapas = []
+
+    def medir(self, etapa, funcao):
+        tempos = []
+        pico = None
+        valor = None
+        for i in range(self.repeticoes):
+            gc.collect()
+            if self.memoria and i == 0:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            valor = funcao()
+            tempos.append(time.perf_counter() - inicio)
+            if self.memoria and i == 0:
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        self.etapas.append({
+            "etapa": etapa,
+            "segundos_min": min(tempos),
+            "segundos_mediana": float(np.median(tempos)),
+            "pico_memoria_bytes": pico,
+        })
+        return valor
+
+
+def executar_cenario(linhas, n_regioes, n_anos, n_tipos, repeticoes, memoria, figuras, diretorio):
+    multiplicidade = max(1, math.ceil(linhas / (n_regioes * n_anos * n_tipos)))
+    base = gerar_base(n_regioes, n_anos, n_tipos, multiplicidade)
+    caminho = os.path.join(diretorio, f"sintetica_{len(base)}.csv")
+    base.to_csv(caminho, index=False)
+    del base
+
+    m = Medidor(repeticoes, memoria)
+    df = m.medir("carga_csv", lambda: carregar_base(caminho, usar_sidecar=False, modo="completa"))
+    m.medir("carga_sidecar", lambda: carregar_base(caminho, usar_sidecar=True, modo="completa"))
+    m.medir("carga_blocos", lambda: carregar_base(caminho, usar_sidecar=False, modo="blocos"))
+    df["Categoria"] = m.medir("categorizar", lambda: categorizar(df["Tipo_Crime"]))
+
+    indice = m.medir("indice_bitmap", lambda: IndiceBitmap(df))
+    cubo = m.medir("cubo", lambda: construir_cubo(agregar_celulas(df).assign(
+        Categoria=lambda d: categorizar(d["Tipo_Crime"]))))
+
+    anos = sorted(df["Ano"].unique())
+    regioes = list(cubo.regioes)
+    cenarios_filtro = {
+        "ultimo_ano": {"Ano": [anos[-1]]},
+        "tudo": {"Ano": anos, "Regiao": regioes},
+        "tres_regioes": {"Ano": anos[-3:], "Regiao": regioes[:3]},
+    }
+    for nome, selecoes in cenarios_filtro.items():
+        m.medir(f"filtro_{nome}", lambda s=selecoes: indice.filtrar(df, s))
+
+    assinatura = assinatura_filtro(cubo, anos=anos[-3:])
+    recorte = m.medir("recorte", lambda: cubo.recortar(anos=assinatura.anos))
+    m.medir("agregacao_kpis", lambda: (recorte.total(), recorte.regioes_presentes(), recorte.por_ano()))
+    m.medir("agregacao_ranking", lambda: recorte.por_regiao().sort_values().tail(15))
+    m.medir("agregacao_tipos", recorte.por_tipo)
+    m.medir("agregacao_temporal", recorte.por_ano_tipo)
+    m.medir("agregacao_heatmap", lambda: recorte.matriz_regiao_ano(top_n=10))
+    m.medir("agregacao_pareto", lambda: recorte.por_regiao().sort_values(ascending=False).head(15).cumsum())
+    pacote = m.medir("pacote_agregados", lambda: calcular_agregados(cubo, assinatura))
+    m.medir("tendencias", lambda: calcular_tendencias(cubo, assinatura_filtro(cubo)))
+
+    if figuras:
+        from analise_criminal.figuras import FIGURAS, TEMA_PADRAO, TEMAS
+
+        for grafico, construir in FIGURAS.items():
+            m.medir(f"figura_{grafico}", lambda c=construir: c(pacote, TEMAS[TEMA_PADRAO]).to_json())
+
+    os.remove(caminho)
+    return {
+        "linhas": int(multiplicidade * n_regioes * n_anos * n_tipos),
+        "regioes": n_regioes,
+        "anos": n_anos,
+        "tipos": n_tipos,
+        "multiplicidade": multiplicidade,
+        "etapas": m.etapas,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--regioes", type=int, default=35)
+    parser.add_argument("--anos", type=int, default=10)
+    parser.add_argument("--tipos", type=int, default=8)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sem-memoria", action="store_true", help="não rastreia memória (menos overhead)")
+    parser.add_argument("--sem-figuras", action="store_true", help="não mede a construção das figuras")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        cenarios = [
+            executar_cenario(n, args.regioes, args.anos, args.tipos, args.repeticoes,
+                             not args.sem_memoria, not args.sem_figuras, diretorio)
+            for n in args.linhas
+        ]
+
+    relatorio = {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "cenarios": cenarios,
+    }
+    texto = json.dumps(relatorio, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Carga de sessões simultâneas sobre o painel, sem navegador nem rede.
+
+Cada sessão simulada é um ``AppTest`` rodando ``crimes_df01.py`` numa
+thread própria e repetindo um traço de interações da sidebar: liga e
+desliga anos e categorias nos ``st.pills`` e escolhe regiões no
+``multiselect``. Todas as sessões dividem o processo, como num worker real:
+mesma base em ``st.cache_resource``, mesmos caches de agregados e figuras,
+mesma GIL. Para cada nível de concorrência o relatório traz vazão
+(reruns/s), latência de rerun p50/p95/p99 e a memória do processo.
+
+Uso::
+
+    python benchmarks/carga_sessoes.py --sessoes 1 2 4 8 16 --passos 20 --saida carga.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Tráfego sintético não entra no log de seleções que guia o aquecimento.
+os.environ["PAINEL_LOG_SELECOES"] = ""
+
+SCRIPT = os.path.join(RAIZ, "crimes_df01.py")
+ROTULO_ANOS = "📅 Anos de Análise"
+ROTULO_CATEGORIAS = "📊 Categorias Criminais"
+ROTULO_REGIOES = "📍 Regiões Administrativas"
+
+# Peso de cada ação nos traços: anos e regiões são as mais usadas.
+ACOES = {"ano": 4, "categoria": 2, "regioes": 3, "limpar_regioes": 1}
+
+
+def gerar_traco(passos, semente):
+    """Lista de ações ``(acao, sorteio)``; o sorteio escolhe o alvo na hora."""
+    rng = random.Random(semente)
+    nomes, pesos = zip(*ACOES.items())
+    return [(rng.choices(nomes, pesos)[0], rng.random()) for _ in range(passos)]
+
+
+def _widget(at, lista, rotulo):
+    for w in getattr(at, lista):
+        if w.label == rotulo:
+            return w
+    raise LookupError(f"Widget '{rotulo}' não encontrado")
+
+
+def aplicar(at, acao, sorteio, rng):
+    """Aplica uma ação do traço ao ``AppTest`` (sem rodar o rerun)."""
+    if acao == "ano":
+        pills = _widget(at, "button_group", ROTULO_ANOS)
+        ano = pills.options[int(sorteio * len(pills.options))]
+        ano = int(ano.content if hasattr(ano, "content") else ano)
+        valor = list(pills.value or [])
+        pills.set_value([a for a in valor if a != ano] if ano in valor else valor + [ano])
+    elif acao == "categoria":
+        pills = _widget(at, "button_group", ROTULO_CATEGORIAS)
+        opcao = pills.options[int(sorteio * len(pills.options))]
+        categoria = opcao.content if hasattr(opcao, "content") else opcao
+        valor = list(pills.value or [])
+        # Nunca deixa a seleção vazia: o painel mostraria só o aviso.
+        if categoria in valor and len(valor) > 1:
+            pills.set_value([c for c in valor if c != categoria])
+        elif categoria not in valor:
+            pills.set_value(valor + [categoria])
+    elif acao == "regioes":
+        seletor = _widget(at, "multiselect", ROTULO_REGIOES)
+        seletor.set_value(rng.sample(list(seletor.options), rng.randint(1, 3)))
+    elif acao == "limpar_regioes":
+        _widget(at, "multiselect", ROTULO_REGIOES).set_value([])
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def sessao(indice, traco, timeout, barreira, latencias, erros):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(indice)
+    try:
+        at = AppTest.from_file(SCRIPT, default_timeout=timeout)
+        at.run()
+        barreira.wait()
+        for acao, sorteio in traco:
+            aplicar(at, acao, sorteio, rng)
+            inicio = time.perf_counter()
+            at.run()
+            latencias.append(time.perf_counter() - inicio)
+            if at.exception:
+                erros.append(f"sessão {indice}, {acao}: {at.exception[0].message}")
+    except Exception as e:  # noqa: BLE001 - a falha de uma sessão entra no relatório
+        erros.append(f"sessão {indice}: {type(e).__name__}: {e}")
+        barreira.abort()
+
+
+def executar_nivel(n_sessoes, passos, semente, timeout, limpar_caches):
+    from analise_criminal.agregados import CACHE_AGREGADOS
+    from analise_criminal.figuras import CACHE_FIGURAS
+
+    if limpar_caches:
+        CACHE_AGREGADOS.limpar()
+        CACHE_FIGURAS.limpar()
+    gc.collect()
+
+    latencias, erros = [], []
+    # A barreira inclui a thread principal: o relógio só começa depois que
+    # todas as sessões fizeram a primeira execução.
+    barreira = threading.Barrier(n_sessoes + 1)
+    threads = [
+        threading.Thread(
+            target=sessao,
+            args=(i, gerar_traco(passos, semente + i), timeout, barreira, latencias, erros),
+            name=f"sessao-{i}",
+        )
+        for i in range(n_sessoes)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        barreira.wait()
+    except threading.BrokenBarrierError:
+        pass
+    inicio = time.perf_counter()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    ms = np.asarray(latencias) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (None, None, None)
+    return {
+        "sessoes": n_sessoes,
+        "reruns": len(latencias),
+        "segundos": duracao,
+        "reruns_por_segundo": len(latencias) / duracao if duracao else None,
+        "latencia_ms": {
+            "p50": None if p50 is None else float(p50),
+            "p95": None if p95 is None else float(p95),
+            "p99": None if p99 is None else float(p99),
+            "max": float(ms.max()) if len(ms) else None,
+        },
+        "rss_kb": _rss_kb(),
+        "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "erros": erros,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--passos", type=int, default=20, help="interações por sessão em cada nível")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="limite por rerun, em segundos")
+    parser.add_argument("--limpar-caches", action="store_true",
+                        help="esvazia os caches de agregados e figuras antes de cada nível")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    # O painel lê a base por caminho relativo, como no deploy.
+    os.chdir(RAIZ)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    niveis = []
+    for n in args.sessoes:
+        nivel = executar_nivel(n, args.passos, args.semente, args.timeout, args.limpar_caches)
+        print(
+            f"{n:>3} sessões: {nivel['reruns_por_segundo'] or 0:.1f} reruns/s, "
+            f"p50 {nivel['latencia_ms']['p50'] or 0:.0f} ms, p95 {nivel['latencia_ms']['p95'] or 0:.0f} ms, "
+            f"p99 {nivel['latencia_ms']['p99'] or 0:.0f} ms, RSS {(nivel['rss_kb'] or 0) / 1024:.0f} MB, "
+            f"{len(nivel['erros'])} erros",
+            file=sys.stderr,
+        )
+        niveis.append(nivel)
+
+    import pandas as pd
+    import streamlit
+
+    relatorio = {
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "pandas": pd.__version__,
+        "cpus": os.cpu_count(),
+        "passos": args.passos,
+        "limpar_caches": args.limpar_caches,
+        "niveis": niveis,
+    }
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
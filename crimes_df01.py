@@ -1,9 +1,20 @@
+import dataclasses
+import hashlib
+import math
+import os
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import numpy as np
+
+from analise_criminal.agregados import CACHE_AGREGADOS, agregados, assinatura_filtro, indicadores, preservar_entradas
+from analise_criminal.aquecimento import iniciar_aquecimento, registrar_selecao
+from analise_criminal.carga import CAMINHO_BASE
+from analise_criminal.figuras import CACHE_FIGURAS, figura
+from analise_criminal.mapa import CAMINHO_GEOJSON, NIVEIS, NIVEL_PADRAO, carregar_geometrias, figura_mapa
+from analise_criminal.perfil import ATIVO_PADRAO, Perfilador, contadores_cache, fragmento, percentis, registrar_rerun
+from analise_criminal.sql import abrir_base
+from analise_criminal.tabela import TAMANHO_PAGINA, TAMANHOS_PAGINA
+from analise_criminal.tendencias import tendencias
 
 # ---------------------------------------------------
 # CONFIGURAÇÃO DA PÁGINA
@@ -18,365 +29,89 @@ st.set_page_config(
 # ---------------------------------------------------
 # CSS CUSTOMIZADO PROFISSIONAL & MOBILE-FIRST
 # ---------------------------------------------------
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-    
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-    
-    html, body, [class*="css"] {
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-        -webkit-font-smoothing: antialiased;
-        -moz-osx-font-smoothing: grayscale;
-    }
-    
-    :root {
-        --primary: #0f172a;
-        --primary-light: #1e293b;
-        --accent: #dc2626;
-        --accent-light: #ef4444;
-        --success: #059669;
-        --warning: #d97706;
-        --bg: #f8fafc;
-        --card: #ffffff;
-        --text: #1e293b;
-        --text-muted: #64748b;
-        --border: #e2e8f0;
-    }
-    
-    .main .block-container {
-        padding: 1rem;
-        max-width: 100%;
-    }
-    
-    @media (min-width: 768px) {
-        .main .block-container {
-            padding: 2rem;
-            max-width: 95%;
-        }
-    }
-    
-    .dashboard-header {
-        background: linear-gradient(135deg, var(--primary) 0%, var(--primary-light) 100%);
-        color: white;
-        padding: 1.5rem;
-        border-radius: 16px;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 10px 40px -10px rgba(15, 23, 42, 0.3);
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .dashboard-header::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        right: -10%;
-        width: 300px;
-        height: 300px;
-        background: radial-gradient(circle, rgba(220, 38, 38, 0.2) 0%, transparent 70%);
-        border-radius: 50%;
-    }
-    
-    .dashboard-header h1 {
-        color: white !important;
-        font-size: clamp(1.5rem, 5vw, 2.5rem);
-        font-weight: 800;
-        margin: 0;
-        border: none;
-        padding: 0;
-        position: relative;
-        z-index: 1;
-    }
-    
-    .dashboard-header .subtitle {
-        color: rgba(255,255,255,0.8);
-        font-size: 0.95rem;
-        margin-top: 0.5rem;
-        font-weight: 400;
-    }
-    
-    .kpi-container {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-        gap: 1rem;
-        margin-bottom: 2rem;
-    }
-    
-    .kpi-card {
-        background: var(--card);
-        border-radius: 16px;
-        padding: 1.5rem;
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.05), 0 2px 4px -1px rgba(0, 0, 0, 0.03);
-        border: 1px solid var(--border);
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .kpi-card:hover {
-        transform: translateY(-4px);
-        box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.1), 0 10px 10px -5px rgba(0, 0, 0, 0.04);
-    }
-    
-    .kpi-card::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        width: 4px;
-        height: 100%;
-        background: var(--accent);
-    }
-    
-    .kpi-card.positive::before { background: var(--success); }
-    .kpi-card.negative::before { background: var(--accent); }
-    .kpi-card.neutral::before { background: var(--warning); }
-    
-    .kpi-label {
-        font-size: 0.875rem;
-        color: var(--text-muted);
-        font-weight: 500;
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-        margin-bottom: 0.5rem;
-    }
-    
-    .kpi-value {
-        font-size: clamp(1.5rem, 4vw, 2.25rem);
-        font-weight: 800;
-        color: var(--text);
-        line-height: 1;
-        margin-bottom: 0.5rem;
-    }
-    
-    .kpi-delta {
-        font-size: 0.875rem;
-        font-weight: 600;
-        display: inline-flex;
-        align-items: center;
-        gap: 0.25rem;
-        padding: 0.25rem 0.75rem;
-        border-radius: 20px;
-        background: rgba(220, 38, 38, 0.1);
-        color: var(--accent);
-    }
-    
-    .kpi-delta.positive {
-        background: rgba(5, 150, 105, 0.1);
-        color: var(--success);
-    }
-    
-    .chart-card {
-        background: var(--card);
-        border-radius: 16px;
-        padding: 1.5rem;
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.05);
-        border: 1px solid var(--border);
-        margin-bottom: 1.5rem;
-    }
-    
-    .chart-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 1rem;
-        flex-wrap: wrap;
-        gap: 0.5rem;
-    }
-    
-    .chart-title {
-        font-size: 1.125rem;
-        font-weight: 700;
-        color: var(--primary);
-        display: flex;
-        align-items: center;
-        gap: 0.5rem;
-    }
-    
-    div[data-testid="stPills"] {
-        display: flex;
-        flex-wrap: wrap;
-        gap: 0.5rem;
-    }
-    
-    div[data-testid="stPills"] button {
-        border-radius: 8px !important;
-        border: 1px solid var(--border) !important;
-        background: var(--bg) !important;
-        color: var(--text) !important;
-        font-weight: 500 !important;
-        padding: 0.5rem 1rem !important;
-        transition: all 0.2s !important;
-    }
-    
-    div[data-testid="stPills"] button[aria-pressed="true"] {
-        background: var(--primary) !important;
-        color: white !important;
-        border-color: var(--primary) !important;
-        box-shadow: 0 4px 6px -1px rgba(15, 23, 42, 0.2);
-    }
-    
-    .stButton button {
-        background: var(--primary) !important;
-        color: white !important;
-        border-radius: 10px !important;
-        border: none !important;
-        padding: 0.75rem 1.5rem !important;
-        font-weight: 600 !important;
-        transition: all 0.2s !important;
-        width: 100%;
-    }
-    
-    .stButton button:hover {
-        background: var(--accent) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 10px 20px -5px rgba(220, 38, 38, 0.3);
-    }
-    
-    .streamlit-expanderHeader {
-        background: var(--bg) !important;
-        border-radius: 12px !important;
-        border: 1px solid var(--border) !important;
-        font-weight: 600 !important;
-        color: var(--primary) !important;
-    }
-    
-    .footer-info {
-        background: linear-gradient(135deg, #f1f5f9 0%, #e2e8f0 100%);
-        border-radius: 12px;
-        padding: 1rem 1.5rem;
-        margin-top: 2rem;
-        border-left: 4px solid var(--primary);
-        display: flex;
-        align-items: center;
-        gap: 0.75rem;
-        font-size: 0.9rem;
-        color: var(--text-muted);
-    }
-    
-    @media (max-width: 640px) {
-        .kpi-container {
-            grid-template-columns: 1fr;
-        }
-        
-        .chart-card {
-            padding: 1rem;
-        }
-        
-        .dashboard-header {
-            padding: 1rem;
-        }
-        
-        div[data-testid="stPills"] button {
-            padding: 0.75rem 1rem !important;
-            min-height: 44px;
-        }
-        
-        .stButton button {
-            min-height: 48px;
-        }
-    }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    .kpi-card, .chart-card {
-        animation: fadeIn 0.5s ease-out forwards;
-    }
-    
-    ::-webkit-scrollbar {
-        width: 8px;
-        height: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: var(--bg);
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: var(--border);
-        border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: var(--text-muted);
-    }
-    
-    @media (max-width: 768px) {
-        [data-testid="stSidebarNav"] { display: none; }
-    }
-</style>
-""", unsafe_allow_html=True)
+# O CSS fica em static/painel.css e vai para o navegador uma vez por sessão;
+# a cada rerun só a tag <link> é reenviada.
+DIRETORIO_ESTATICO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+FOLHA_ESTILO = "painel.css"
+
+@st.cache_resource
+def tag_estilo():
+    with open(os.path.join(DIRETORIO_ESTATICO, FOLHA_ESTILO), "rb") as f:
+        conteudo = f.read()
+    if not st.get_option("server.enableStaticServing"):
+        # Sem static serving (config.toml ausente) o CSS volta a ir embutido.
+        return f"<style>{conteudo.decode()}</style>"
+    # O hash do conteúdo no link invalida o cache do navegador quando o CSS muda.
+    versao = hashlib.sha1(conteudo).hexdigest()[:10]
+    return f'<link rel="stylesheet" href="app/static/{FOLHA_ESTILO}?v={versao}">'
+
+st.markdown(tag_estilo(), unsafe_allow_html=True)
+
+# ---------------------------------------------------
+# INSTRUMENTAÇÃO (opcional: PAINEL_PERFIL=1 ou ?perfil=1)
+# ---------------------------------------------------
+perfil = Perfilador(ativo=ATIVO_PADRAO or st.query_params.get("perfil") == "1")
 
 # ---------------------------------------------------
 # CARREGAMENTO DOS DADOS COM CACHE OTIMIZADO
 # ---------------------------------------------------
-@st.cache_data(ttl=3600, show_spinner="Carregando dados...")
+# Fontes da base: o CSV principal e um diretório opcional com arquivos
+# por ano. Só partições novas ou alteradas são relidas a cada verificação.
+DIRETORIO_INCREMENTOS = os.environ.get("PAINEL_DIRETORIO_DADOS", "dados")
+
+@st.cache_resource(show_spinner="Carregando dados...")
+def base_incremental():
+    # PAINEL_BACKEND=sql mantém a base num banco local em vez da memória.
+    return abrir_base([CAMINHO_BASE, DIRETORIO_INCREMENTOS])
+
+# Uma vez por processo, em segundo plano: a visão padrão e as seleções mais
+# usadas (PAINEL_AQUECER e o log de seleções) entram nos caches enquanto as
+# sessões já são atendidas. A base em si pode ficar pronta antes do deploy
+# com `python -m analise_criminal.aquecimento`.
+@st.cache_resource
+def aquecedor():
+    return iniciar_aquecimento(lambda: base_incremental().estado)
+
 def carregar_dados():
     try:
-        df = pd.read_csv("base_criminalidade_tratada.csv")
-        
-        colunas_necessarias = ['Tipo_Crime', 'Ano', 'Quantidade', 'Regiao']
-        for col in colunas_necessarias:
-            if col not in df.columns:
-                st.error(f"Coluna '{col}' não encontrada no dataset")
-                return pd.DataFrame()
+        base = base_incremental()
         
-        def classificar(crime):
-            c = str(crime).upper()
-            if any(x in c for x in ['HOMICÍDIO', 'LATROCÍNIO', 'MORTE', 'FEMINICÍDIO']):
-                return 'Crimes Contra a Vida'
-            if 'ROUBO' in c:
-                return 'Roubos'
-            if 'FURTO' in c:
-                return 'Furtos'
-            if any(x in c for x in ['TRÁFICO', 'DROGA', 'ENTORPECENTE']):
-                return 'Drogas'
-            return 'Outros Crimes'
+        atualizacao = base.atualizar()
+        if atualizacao is not None:
+            # Só as visões que tocam os anos alterados perdem o cache.
+            for cache in (CACHE_AGREGADOS, CACHE_FIGURAS):
+                preservar_entradas(cache, atualizacao.versao_antiga, atualizacao.versao_nova, atualizacao.anos_afetados)
         
-        df["Categoria"] = df["Tipo_Crime"].apply(classificar)
-        df = df.dropna(subset=['Quantidade', 'Ano'])
-        df['Quantidade'] = pd.to_numeric(df['Quantidade'], errors='coerce').fillna(0)
-        df['Ano'] = pd.to_numeric(df['Ano'], errors='coerce').astype(int)
-        
-        return df
+        # Cada sessão recebe sua cópia rasa do frame compartilhado.
+        return base.estado.para_sessao()
         
     except FileNotFoundError:
-        st.error("Arquivo 'base_criminalidade_tratada.csv' não encontrado!")
-        return pd.DataFrame()
+        st.error(f"Arquivo '{CAMINHO_BASE}' não encontrado!")
+    except ValueError as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"Erro ao carregar dados: {str(e)}")
-        return pd.DataFrame()
+    return None
+
+aquecimento = aquecedor()
 
-df = carregar_dados()
+with perfil.secao("carga"):
+    estado = carregar_dados()
 
-if df.empty:
+if estado is None or not estado.cubo.linhas.any():
     st.stop()
 
+cubo = estado.cubo
+
 # ---------------------------------------------------
 # SIDEBAR COLAPSÁVEL
 # ---------------------------------------------------
-with st.sidebar:
-    st.markdown("### 🎛️ Painel de Controle")
-    
-    st.markdown("""
-    <style>
-    @media (max-width: 768px) {
-        [data-testid="stSidebar"] {
-            width: 100% !important;
-        }
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    anos_disponiveis = sorted(df["Ano"].unique(), reverse=True)
+# Com PAINEL_FILTROS_EM_LOTE=1 o modo "aplicar em lote" começa ligado.
+APLICAR_EM_LOTE = os.environ.get("PAINEL_FILTROS_EM_LOTE", "").lower() in ("1", "true", "sim")
+
+anos_disponiveis = sorted(cubo.anos, reverse=True)
+
+def filtros_sidebar():
     anos_selecionados = st.pills(
         "📅 Anos de Análise",
         options=anos_disponiveis,
@@ -392,14 +127,14 @@ with st.sidebar:
     
     categorias = st.pills(
         "📊 Categorias Criminais",
-        options=sorted(df["Categoria"].unique()),
+        options=list(cubo.categorias),
         selection_mode="multi",
-        default=sorted(df["Categoria"].unique()),
+        default=list(cubo.categorias),
         help="Filtrar por categoria de crime"
     )
     
     with st.expander("🔍 Tipos Específicos de Crime"):
-        crimes_filtrados = df[df["Categoria"].isin(categorias)]["Tipo_Crime"].unique()
+        crimes_filtrados = cubo.tipos_das_categorias(categorias)
         crimes_selecionados = st.multiselect(
             "Selecione os tipos",
             options=sorted(crimes_filtrados),
@@ -409,7 +144,7 @@ with st.sidebar:
     
     st.divider()
     
-    regioes_disponiveis = sorted(df["Regiao"].dropna().unique())
+    regioes_disponiveis = list(cubo.regioes)
     regioes = st.multiselect(
         "📍 Regiões Administrativas",
         options=regioes_disponiveis,
@@ -419,22 +154,88 @@ with st.sidebar:
     
     if st.button("🔄 Resetar Filtros", use_container_width=True):
         st.rerun()
+    
+    return {"anos": anos_selecionados, "categorias": categorias, "tipos": crimes_selecionados, "regioes": regioes}
+
+def selecoes_de(filtros):
+    return {
+        "Categoria": filtros["categorias"],
+        "Tipo_Crime": filtros["tipos"],
+        "Ano": filtros["anos"],
+        "Regiao": filtros["regioes"],
+    }
+
+# No modo em lote a sidebar é um fragmento: cada clique só reexecuta a
+# sidebar, com uma prévia barata (rollups e índice), e o painel inteiro
+# roda uma única vez quando as alterações são aplicadas.
+@st.fragment
+def sidebar_em_lote():
+    with fragmento(perfil, "sidebar") as perfil_fragmento, perfil_fragmento.secao("sidebar"):
+        return _sidebar_em_lote()
+
+def _sidebar_em_lote():
+    pendentes = filtros_sidebar()
+    aplicados = st.session_state.setdefault("filtros_aplicados", pendentes)
+    
+    assinatura_pendente = assinatura_filtro(cubo, **pendentes)
+    alterado = assinatura_pendente != assinatura_filtro(cubo, **aplicados)
+    total_previa, regioes_previa, _ = cubo.resumo(
+        anos=assinatura_pendente.anos,
+        categorias=assinatura_pendente.categorias,
+        tipos=assinatura_pendente.tipos,
+        regioes=assinatura_pendente.regioes,
+    )
+    registros_previa = estado.contar(selecoes_de(pendentes))
+    st.caption(
+        f"{'✏️ Seleção pendente' if alterado else '✅ Seleção aplicada'}: "
+        f"{total_previa:,} ocorrências • {regioes_previa} regiões • {registros_previa:,} registros".replace(",", ".")
+    )
+    
+    if st.button("✅ Aplicar filtros", type="primary", disabled=not alterado, use_container_width=True):
+        st.session_state["filtros_aplicados"] = pendentes
+        st.rerun(scope="app")
+
+with st.sidebar, perfil.secao("sidebar"):
+    st.markdown("### 🎛️ Painel de Controle")
+    
+    em_lote = st.toggle(
+        "⚡ Aplicar filtros em lote",
+        value=APLICAR_EM_LOTE,
+        key="filtros_em_lote",
+        help="Acumula as alterações e atualiza o painel só ao clicar em Aplicar"
+    )
+    
+    if em_lote:
+        sidebar_em_lote()
+        filtros = st.session_state["filtros_aplicados"]
+    else:
+        filtros = filtros_sidebar()
+        st.session_state["filtros_aplicados"] = filtros
+
+anos_selecionados = filtros["anos"]
+categorias = filtros["categorias"]
+crimes_selecionados = filtros["tipos"]
+regioes = filtros["regioes"]
 
 # ---------------------------------------------------
 # FILTRAGEM INTELIGENTE
 # ---------------------------------------------------
-mask_categoria = df["Categoria"].isin(categorias) if categorias else pd.Series([True] * len(df))
-df_categorizado = df[mask_categoria]
-
-if 'crimes_selecionados' in locals() and crimes_selecionados:
-    df_categorizado = df_categorizado[df_categorizado["Tipo_Crime"].isin(crimes_selecionados)]
-
-df_filtro = df_categorizado[
-    (df_categorizado["Ano"].isin(anos_selecionados))
-]
+# As linhas filtradas só são materializadas quando a tabela de detalhes
+# está aberta; KPIs e gráficos vêm do cubo.
+selecoes = selecoes_de(filtros)
 
-if regioes:
-    df_filtro = df_filtro[df_filtro["Regiao"].isin(regioes)]
+# Gráficos e estatísticas vêm de um único pacote de agregados,
+# compartilhado entre sessões que usam a mesma seleção; os KPIs saem antes,
+# direto dos rollups do cubo.
+assinatura = assinatura_filtro(
+    cubo,
+    anos=anos_selecionados,
+    categorias=categorias,
+    tipos=crimes_selecionados,
+    regioes=regioes,
+)
+# As seleções de cada rerun alimentam o aquecimento da próxima partida.
+registrar_selecao(dataclasses.asdict(assinatura))
 
 # ---------------------------------------------------
 # HEADER PRINCIPAL
@@ -450,21 +251,16 @@ st.markdown(f"""
 # ---------------------------------------------------
 # KPIs
 # ---------------------------------------------------
-total_periodo = int(df_filtro["Quantidade"].sum())
-regioes_afetadas = df_filtro["Regiao"].nunique()
-
-variacao = 0
-if len(anos_selecionados) >= 2:
-    anos_ord = sorted(anos_selecionados)
-    totais_por_ano = df_filtro.groupby("Ano")["Quantidade"].sum()
-    if len(totais_por_ano) >= 2:
-        ultimo = totais_por_ano[anos_ord[-1]]
-        penultimo = totais_por_ano[anos_ord[-2]]
-        variacao = ((ultimo - penultimo) / penultimo * 100) if penultimo else 0
+with perfil.secao("kpis"):
+    kpis = indicadores(cubo, assinatura)
+
+total_periodo = kpis.total
+regioes_afetadas = kpis.regioes_afetadas
+variacao = kpis.variacao
 
 col1, col2, col3 = st.columns(3)
 
-with col1:
+with col1, perfil.secao("kpis"):
     st.markdown(f"""
     <div class="kpi-card neutral">
         <div class="kpi-label">Total de Ocorrências</div>
@@ -473,7 +269,7 @@ with col1:
     </div>
     """, unsafe_allow_html=True)
 
-with col2:
+with col2, perfil.secao("kpis"):
     delta_class = "positive" if variacao < 0 else "negative" if variacao > 0 else "neutral"
     delta_icon = "↓" if variacao < 0 else "↑" if variacao > 0 else "→"
     st.markdown(f"""
@@ -484,7 +280,7 @@ with col2:
     </div>
     """, unsafe_allow_html=True)
 
-with col3:
+with col3, perfil.secao("kpis"):
     st.markdown(f"""
     <div class="kpi-card neutral">
         <div class="kpi-label">Cobertura Territorial</div>
@@ -493,242 +289,198 @@ with col3:
     </div>
     """, unsafe_allow_html=True)
 
+if len(kpis.totais_por_ano) >= 2:
+    with st.expander("📅 Variação entre todos os anos selecionados"):
+        st.dataframe(
+            kpis.matriz_variacao.style.format("{:+.1f}%", na_rep="—"),
+            use_container_width=True
+        )
+
+with perfil.secao("agregados"):
+    pacote = agregados(cubo, assinatura)
+
 # ---------------------------------------------------
 # GRÁFICOS PRINCIPAIS
 # ---------------------------------------------------
+# Cada gráfico vai num container com chave: o CSS estiliza o cartão pela
+# classe st-key-card_<grafico>, sem blocos de HTML abrindo e fechando.
+def cartao(grafico, titulo):
+    card = st.container(key=f"card_{grafico}")
+    card.markdown(f'<div class="chart-title">{titulo}</div>', unsafe_allow_html=True)
+    return card
+
 col_left, col_right = st.columns([2, 1], gap="large")
 
-with col_left:
-    st.markdown("""
-    <div class="chart-card">
-        <div class="chart-header">
-            <div class="chart-title">🏆 Ranking de Incidência Criminal</div>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    ranking = df_filtro.groupby("Regiao")["Quantidade"].sum().reset_index()
-    ranking = ranking[ranking["Regiao"].notna()].sort_values("Quantidade", ascending=True).tail(15)
-    
-    fig_rank = px.bar(
-        ranking,
-        x="Quantidade",
-        y="Regiao",
-        orientation="h",
-        color="Quantidade",
-        color_continuous_scale="Reds",
-        text="Quantidade",
-        height=500
-    )
-    
-    fig_rank.update_traces(
-        textposition='outside',
-        texttemplate='%{text:,.0f}',
-        marker_line_width=0
-    )
-    
-    fig_rank.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=10, r=10, t=10, b=10),
-        coloraxis_showscale=False,
-        xaxis_title="",
-        yaxis_title="",
-        font=dict(family="Inter, sans-serif")
-    )
-    
-    st.plotly_chart(fig_rank, use_container_width=True, config={'displayModeBar': False})
-    st.markdown("</div>", unsafe_allow_html=True)
-
-with col_right:
-    st.markdown("""
-    <div class="chart-card">
-        <div class="chart-header">
-            <div class="chart-title">🔬 Distribuição por Tipo de Crime</div>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    df_tipo = df_filtro.groupby("Tipo_Crime")["Quantidade"].sum().reset_index()
-    
-    fig_pie = px.pie(
-        df_tipo,
-        values="Quantidade",
-        names="Tipo_Crime",
-        hole=0.6,
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
-    
-    fig_pie.update_traces(
-        textposition='inside',
-        textinfo='percent+label',
-        insidetextorientation='radial',
-        pull=[0.02] * len(df_tipo)
-    )
-    
-    fig_pie.update_layout(
-        showlegend=False,
-        margin=dict(l=10, r=10, t=30, b=10),
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(family="Inter, sans-serif"),
-        annotations=[dict(text='Total<br>{}'.format(total_periodo), x=0.5, y=0.5, font_size=16, showarrow=False)]
-    )
-    
-    st.plotly_chart(fig_pie, use_container_width=True, config={'displayModeBar': False})
-    st.markdown("</div>", unsafe_allow_html=True)
+with col_left, perfil.secao("ranking"), cartao("ranking", "🏆 Ranking de Incidência Criminal"):
+    st.plotly_chart(figura("ranking", cubo, assinatura, pacote), use_container_width=True, config={'displayModeBar': False})
+
+with col_right, perfil.secao("tipos"), cartao("tipos", "🔬 Distribuição por Tipo de Crime"):
+    st.plotly_chart(figura("tipos", cubo, assinatura, pacote), use_container_width=True, config={'displayModeBar': False})
 
 # ---------------------------------------------------
 # TENDÊNCIA TEMPORAL
 # ---------------------------------------------------
-st.markdown("""
-<div class="chart-card">
-    <div class="chart-header">
-        <div class="chart-title">📈 Evolução Temporal por Tipo de Crime</div>
-    </div>
-""", unsafe_allow_html=True)
-
-serie_temporal = df_filtro.groupby(["Ano", "Tipo_Crime"])["Quantidade"].sum().reset_index()
-
-fig_line = px.line(
-    serie_temporal,
-    x="Ano",
-    y="Quantidade",
-    color="Tipo_Crime",
-    markers=True,
-    line_shape="spline",
-    color_discrete_sequence=px.colors.qualitative.Set1
-)
-
-fig_line.update_traces(line_width=3, marker_size=8, opacity=0.7)
-fig_line.update_layout(
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    margin=dict(l=10, r=10, t=10, b=10),
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="right",
-        x=1,
-        font=dict(size=10),
-        itemclick="toggle",
-        itemdoubleclick="toggleothers"
-    ),
-    xaxis_title="",
-    yaxis_title="Quantidade de Ocorrências",
-    font=dict(family="Inter, sans-serif"),
-    hovermode="x unified"
-)
-
-st.plotly_chart(fig_line, use_container_width=True, config={'displayModeBar': False})
-st.markdown("</div>", unsafe_allow_html=True)
+with perfil.secao("temporal"), cartao("temporal", "📈 Evolução Temporal por Tipo de Crime"):
+    st.plotly_chart(figura("temporal", cubo, assinatura, pacote), use_container_width=True, config={'displayModeBar': False})
 
 # ---------------------------------------------------
-# HEATMAP E PARETO
+# HEATMAP, PARETO, MAPA E HOTSPOTS
 # ---------------------------------------------------
-col_heat, col_pareto = st.columns(2)
-
-with col_heat:
-    st.markdown("""
-    <div class="chart-card">
-        <div class="chart-header">
-            <div class="chart-title">🔥 Intensidade por Região e Ano</div>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    top_regioes = df_filtro.groupby("Regiao")["Quantidade"].sum().nlargest(10).index
-    df_heat = df_filtro[df_filtro["Regiao"].isin(top_regioes)]
-    
-    pivot = df_heat.pivot_table(
-        values="Quantidade", 
-        index="Regiao", 
-        columns="Ano", 
-        aggfunc="sum", 
-        fill_value=0
-    )
-    
-    fig_heat = px.imshow(
-        pivot,
-        aspect="auto",
-        color_continuous_scale="Reds",
-        labels=dict(color="Ocorrências"),
-        height=400
-    )
-    
-    fig_heat.update_layout(
-        margin=dict(l=10, r=10, t=10, b=10),
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(family="Inter, sans-serif")
-    )
-    
-    st.plotly_chart(fig_heat, use_container_width=True, config={'displayModeBar': False})
-    st.markdown("</div>", unsafe_allow_html=True)
-
-with col_pareto:
-    st.markdown("""
-    <div class="chart-card">
-        <div class="chart-header">
-            <div class="chart-title">📊 Concentração Criminal (Pareto)</div>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    pareto = df_filtro.groupby("Regiao")["Quantidade"].sum().sort_values(ascending=False).head(15)
-    pareto_acum = (pareto.cumsum() / pareto.sum() * 100).round(1)
-    
-    fig_pareto = make_subplots(specs=[[{"secondary_y": True}]])
-    
-    # Barras em azul claro
-    fig_pareto.add_trace(
-        go.Bar(x=pareto.index, y=pareto.values, name="Quantidade", marker_color="#4F8BF9"),
-        secondary_y=False
-    )
-    
-    # Linha de percentual em laranja
-    fig_pareto.add_trace(
-        go.Scatter(x=pareto.index, y=pareto_acum.values, name="% Acumulado", 
-                  mode='lines+markers', line=dict(color="#FF9F1C", width=3)),
-        secondary_y=True
-    )
-    
-    fig_pareto.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=10, r=10, t=10, b=10),
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=1.02),
-        font=dict(family="Inter, sans-serif"),
-        height=400
-    )
-    
-    fig_pareto.update_yaxes(title_text="Quantidade", secondary_y=False)
-    fig_pareto.update_yaxes(title_text="% Acumulado", range=[0, 105], secondary_y=True)
-    fig_pareto.update_xaxes(tickangle=45)
-    
-    st.plotly_chart(fig_pareto, use_container_width=True, config={'displayModeBar': False})
-    st.markdown("</div>", unsafe_allow_html=True)
+# Seções abaixo da dobra rodam como fragmentos: só a aba aberta calcula e
+# serializa o seu gráfico, e trocar de aba não refaz KPIs nem ranking.
+@st.fragment
+def secao_complementar(cubo, assinatura, pacote):
+    # Sozinho (troca de aba), o fragmento registra os próprios tempos.
+    with fragmento(perfil, "complementar") as perfil_fragmento:
+        _secao_complementar(perfil_fragmento, cubo, assinatura, pacote)
+
+def _secao_complementar(perfil, cubo, assinatura, pacote):
+    rotulos = {
+        "heatmap": "🔥 Intensidade por Região e Ano",
+        "pareto": "📊 Concentração Criminal (Pareto)",
+        "mapa": "🗺️ Mapa das Regiões",
+        "hotspots": "🚀 Hotspots de Crescimento",
+    }
+    # O mapa é opcional: a aba só existe com o GeoJSON das regiões (PAINEL_GEOJSON).
+    if not os.path.exists(CAMINHO_GEOJSON):
+        del rotulos["mapa"]
+    abas = dict(zip(rotulos, st.tabs(list(rotulos.values()), on_change="rerun", key="aba_complementar")))
+    aba_heat, aba_pareto, aba_mapa, aba_hotspots = (abas.get(nome) for nome in ("heatmap", "pareto", "mapa", "hotspots"))
+    
+    if aba_heat.open:
+        with aba_heat, perfil.secao("heatmap"), cartao("heatmap", "🔥 Intensidade por Região e Ano"):
+            st.plotly_chart(figura("heatmap", cubo, assinatura, pacote), use_container_width=True, config={'displayModeBar': False})
+    
+    if aba_pareto.open:
+        with aba_pareto, perfil.secao("pareto"), cartao("pareto", "📊 Concentração Criminal (Pareto)"):
+            st.plotly_chart(figura("pareto", cubo, assinatura, pacote), use_container_width=True, config={'displayModeBar': False})
+    
+    if aba_mapa is not None and aba_mapa.open:
+        with aba_mapa, perfil.secao("mapa"):
+            try:
+                geo = carregar_geometrias()
+            except (OSError, ValueError) as e:
+                geo = None
+                st.warning(f"Mapa indisponível: {e}")
+            
+            if geo is not None:
+                # Contorno mais simples por padrão: menos bytes para quem está no celular.
+                nivel = st.segmented_control(
+                    "Detalhe do contorno",
+                    list(NIVEIS),
+                    format_func={"geral": "Geral", "medio": "Médio", "detalhado": "Detalhado"}.get,
+                    default=NIVEL_PADRAO,
+                    key="mapa_nivel"
+                ) or NIVEL_PADRAO
+                with cartao("mapa", "🗺️ Ocorrências por Região Administrativa"):
+                    st.plotly_chart(figura_mapa(geo, cubo, assinatura, pacote, nivel), use_container_width=True, config={'displayModeBar': False})
+                sem_geometria = geo.sem_geometria(pacote.por_regiao.index)
+                if sem_geometria:
+                    st.caption("Sem geometria no mapa: " + ", ".join(sem_geometria))
+    
+    if aba_hotspots.open:
+        with aba_hotspots, perfil.secao("hotspots"):
+            # Todas as séries região × tipo pontuadas de uma vez sobre o
+            # histórico até o último ano selecionado.
+            series = tendencias(cubo, assinatura)
+            
+            col_ordem, col_minimo, col_top = st.columns([2, 1, 1])
+            with col_ordem:
+                criterio = st.selectbox(
+                    "Ordenar por",
+                    ["Tendencia", "Tendencia_Pct", "Variacao_Pct", "Z_Score"],
+                    format_func={
+                        "Tendencia": "Tendência (ocorrências/ano)",
+                        "Tendencia_Pct": "Tendência (% ao ano)",
+                        "Variacao_Pct": "Variação anual (%)",
+                        "Z_Score": "Anomalia do último ano (z-score)",
+                    }.get,
+                    key="hotspots_ordem"
+                )
+            with col_minimo:
+                minimo = st.number_input("Mínimo no último ano", min_value=0, value=10, step=5, key="hotspots_minimo",
+                                         help="Ignora séries com poucas ocorrências, onde variações são ruído")
+            with col_top:
+                top_n = st.number_input("Séries", min_value=5, max_value=500, value=20, step=5, key="hotspots_top")
+            
+            visiveis = series[series["Ultimo_Ano"] >= minimo].nlargest(int(top_n), criterio)
+            st.dataframe(
+                visiveis,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Regiao": "Região Administrativa",
+                    "Tipo_Crime": "Tipo de Crime",
+                    "Ultimo_Ano": st.column_config.NumberColumn("Último Ano", help="Ocorrências no último ano do histórico"),
+                    "Media_Historica": st.column_config.NumberColumn("Média", format="%.1f"),
+                    "Tendencia": st.column_config.NumberColumn("Tendência/ano", format="%+.2f", help="Inclinação da reta de mínimos quadrados"),
+                    "Tendencia_Pct": st.column_config.NumberColumn("Tendência %", format="%+.1f%%"),
+                    "Variacao_Pct": st.column_config.NumberColumn("Var. Anual %", format="%+.1f%%"),
+                    "Z_Score": st.column_config.NumberColumn("Z-score", format="%+.2f", help="Último ano contra a média e o desvio dos anos anteriores")
+                }
+            )
+
+secao_complementar(cubo, assinatura, pacote)
 
 # ---------------------------------------------------
 # TABELA ANALÍTICA
 # ---------------------------------------------------
-with st.expander("📋 Dados Detalhados (Clique para expandir)"):
-    col_stats1, col_stats2, col_stats3 = st.columns(3)
-    with col_stats1:
-        st.metric("Média por Região", f"{df_filtro.groupby('Regiao')['Quantidade'].sum().mean():.0f}")
-    with col_stats2:
-        st.metric("Mediana", f"{df_filtro['Quantidade'].median():.0f}")
-    with col_stats3:
-        st.metric("Desvio Padrão", f"{df_filtro['Quantidade'].std():.0f}")
-    
-    st.dataframe(
-        df_filtro.sort_values("Quantidade", ascending=False),
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "Quantidade": st.column_config.NumberColumn("Qtd", help="Quantidade de ocorrências"),
-            "Ano": st.column_config.NumberColumn("Ano", format="%d"),
-            "Regiao": "Região Administrativa",
-            "Tipo_Crime": "Tipo de Crime",
-            "Categoria": "Categoria"
-        }
-    )
+@st.fragment
+def secao_detalhes(estado, selecoes, pacote):
+    with fragmento(perfil, "detalhes") as perfil_fragmento:
+        _secao_detalhes(perfil_fragmento, estado, selecoes, pacote)
+
+def _secao_detalhes(perfil, estado, selecoes, pacote):
+    detalhes = st.expander("📋 Dados Detalhados (Clique para expandir)", on_change="rerun", key="exp_detalhes")
+    if not detalhes.open:
+        return
+    
+    with detalhes, perfil.secao("tabela"):
+        col_stats1, col_stats2, col_stats3 = st.columns(3)
+        with col_stats1:
+            st.metric("Média por Região", f"{pacote.media_regiao:.0f}")
+        with col_stats2:
+            st.metric("Mediana", f"{pacote.mediana:.0f}")
+        with col_stats3:
+            st.metric("Desvio Padrão", f"{pacote.desvio:.0f}")
+        
+        # Só a página visível é ordenada e enviada ao navegador, seja por
+        # seleção parcial em memória, seja por ORDER BY/LIMIT no banco.
+        total = estado.contar(selecoes)
+        colunas_base = estado.colunas
+        
+        col_ord, col_dir, col_tam, col_pag = st.columns([2, 1, 1, 1])
+        with col_ord:
+            coluna_ordem = st.selectbox("Ordenar por", colunas_base, index=colunas_base.index("Quantidade"), key="tabela_ordem")
+        with col_dir:
+            descendente = st.radio("Ordem", ["Decrescente", "Crescente"], key="tabela_direcao") == "Decrescente"
+        with col_tam:
+            tamanho = st.selectbox("Linhas por página", TAMANHOS_PAGINA, index=TAMANHOS_PAGINA.index(TAMANHO_PAGINA) if TAMANHO_PAGINA in TAMANHOS_PAGINA else 1, key="tabela_tamanho")
+        paginas = max(1, math.ceil(total / tamanho))
+        with col_pag:
+            pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1, key="tabela_pagina")
+        
+        colunas = st.multiselect("Colunas", colunas_base, default=colunas_base, key="tabela_colunas") or colunas_base
+        
+        resultado = estado.pagina(selecoes, coluna_ordem, descendente, int(pagina) - 1, tamanho, colunas)
+        fim = resultado.inicio + len(resultado.linhas)
+        st.caption(f"Linhas {resultado.inicio + 1 if fim else 0:,}–{fim:,} de {resultado.total:,}".replace(",", "."))
+        
+        st.dataframe(
+            resultado.linhas,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Quantidade": st.column_config.NumberColumn("Qtd", help="Quantidade de ocorrências"),
+                "Ano": st.column_config.NumberColumn("Ano", format="%d"),
+                "Regiao": "Região Administrativa",
+                "Tipo_Crime": "Tipo de Crime",
+                "Categoria": "Categoria",
+                "Linhas": st.column_config.NumberColumn("Registros", help="Registros de origem agregados na linha")
+            }
+        )
+
+secao_detalhes(estado, selecoes, pacote)
 
 # ---------------------------------------------------
 # FOOTER COM FONTE DOS DADOS
@@ -742,3 +494,31 @@ st.markdown("""
     </div>
 </div>
 """.format(pd.Timestamp.now().strftime("%d/%m/%Y")), unsafe_allow_html=True)
+
+# ---------------------------------------------------
+# PAINEL DE PERFORMANCE
+# ---------------------------------------------------
+if perfil.ativo:
+    caches = contadores_cache({"agregados": CACHE_AGREGADOS, "figuras": CACHE_FIGURAS})
+    registro = registrar_rerun(perfil, assinatura=dataclasses.asdict(assinatura), caches=caches)
+    
+    with st.expander("⏱️ Performance do Rerun"):
+        st.caption(f"Rerun atual: {registro['total_ms']:.1f} ms")
+        if aquecimento is not None:
+            st.caption(
+                f"Aquecimento: {aquecimento.aquecidas}/{aquecimento.selecoes} seleções em {aquecimento.segundos:.2f} s"
+                if aquecimento.concluido.is_set() else "Aquecimento em andamento..."
+            )
+        st.dataframe(
+            pd.DataFrame(list(registro["secoes_ms"].items()), columns=["Seção", "Tempo (ms)"]),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.markdown("**Percentis entre sessões**")
+        st.dataframe(percentis(), use_container_width=True, hide_index=True)
+        st.markdown("**Caches**")
+        st.dataframe(
+            pd.DataFrame(caches).T.rename_axis("Cache").reset_index(),
+            use_container_width=True,
+            hide_index=True
+        )